@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+"""
+Validate all the app packages in a directory from the command line, in
+parallel, writing the results as JSON Lines.
+"""
+
+import os
+import sys
+import json
+import time
+from multiprocessing import Pool, cpu_count
+import paf
+from cli.cache import results_of
+from cli.validate import exit_code
+
+
+__all__ = ['batch', 'find_packages']
+
+
+def find_packages(directory):
+    """Get the paths of the packages in a directory containing packages."""
+    packages = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.abspath(os.path.join(directory, name))
+        # Skip files and the "PortableApps.com" directory (Platform etc.)
+        if os.path.isdir(path) and name != 'PortableApps.com':
+            packages.append(path)
+    return packages
+
+
+def _validate(path):
+    """
+    Validate a package (in a worker process). Returns a tuple of the path,
+    the results (see ``results_of``) or None for a critical error, the
+    critical error message or None, and the time taken in seconds.
+    """
+    start = time.time()
+    try:
+        results = results_of(paf.Package(path))
+    except (paf.PAFException, EnvironmentError) as msg:
+        return path, None, unicode(msg), time.time() - start
+    return path, results, None, time.time() - start
+
+
+def _line(out, data):
+    out.write(json.dumps(data) + '\n')
+    out.flush()
+
+
+def batch(directory, processes=None, cache=None, state=None,
+        out=sys.stdout):
+    """
+    Validate all the packages in ``directory`` on a pool of ``processes``
+    worker processes (by default, one per processor).
+
+    Each package's results are written to ``out`` as a JSON object on a line
+    of its own as soon as they are ready, so they will not be in any
+    particular order. The keys are ``package`` (the path), ``exit_code`` (as
+    for ``cli.validate.validate``), ``errors``, ``warnings``, ``info`` (lists
+    of results as from ``ValidatorItem.to_dict()``), ``critical`` (for an
+    exit code of 3, the error message), ``cached``, ``unchanged`` and
+    ``time`` (in seconds). Finally, a summary object is written, with the key
+    ``summary``.
+
+    If a ``RepositoryState`` is given as ``state``, packages whose
+    fingerprints haven't changed since the last run are reported from it
+    without being opened at all, and the state is updated (but not saved)
+    with the results of the others. If a ``ResultCache`` is given as
+    ``cache``, packages which haven't changed are reported from it rather
+    than being validated again.
+
+    The return value is the highest exit code of any package.
+    """
+
+    start = time.time()
+    counts = {0: 0, 1: 0, 2: 0, 3: 0}
+    times = {}
+
+    def report(path, results, critical, seconds, cached, unchanged=False):
+        if critical is None:
+            code = exit_code(results['errors'], results['warnings'])
+        else:
+            code = 3
+        counts[code] += 1
+        times[path] = round(seconds, 4)
+        _line(out, {
+            'package': path,
+            'exit_code': code,
+            'errors': results['errors'] if results else [],
+            'warnings': results['warnings'] if results else [],
+            'info': results['info'] if results else [],
+            'critical': critical,
+            'cached': cached,
+            'unchanged': unchanged,
+            'time': times[path],
+            })
+
+    paths = find_packages(directory)
+    to_validate = []
+    unchanged = 0
+    for path in paths:
+        lookup_start = time.time()
+        previous = state.get(path) if state is not None else None
+        if previous is not None:
+            unchanged += 1
+            report(path, previous[0], previous[1],
+                    time.time() - lookup_start, True, True)
+            continue
+
+        results = cache.get(path) if cache is not None else None
+        if results is None:
+            to_validate.append(path)
+        else:
+            errors, warnings, info = [[item.to_dict() for item in items]
+                for items in results]
+            results = {'errors': errors, 'warnings': warnings, 'info': info}
+            if state is not None:
+                state.store(path, results)
+            report(path, results, None, time.time() - lookup_start, True)
+
+    if to_validate:
+        pool = Pool(processes or cpu_count())
+        try:
+            for path, results, critical, seconds in \
+                    pool.imap_unordered(_validate, to_validate):
+                if cache is not None and results is not None:
+                    cache.store(path, results)
+                if state is not None:
+                    state.store(path, results, critical)
+                report(path, results, critical, seconds, False)
+        except KeyboardInterrupt:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    if state is not None:
+        state.prune(directory, paths)
+
+    _line(out, {'summary': {
+        'packages': sum(counts.itervalues()),
+        'passed': counts[0],
+        'warnings': counts[1],
+        'errors': counts[2],
+        'critical': counts[3],
+        'unchanged': unchanged,
+        'validated': len(to_validate),
+        'time': round(time.time() - start, 4),
+        'times': times,
+        }})
+
+    return max(code for code in counts if counts[code]) if times else 0
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+A persistent cache of validation results, so that packages which haven't
+changed since they were last validated don't need to be opened again.
+"""
+
+import os
+import json
+import sqlite3
+import config
+from utils import file_signature
+from validator.engine import ValidatorItem
+from validator.rules import rule_packs_signature
+
+
+__all__ = ['ResultCache', 'results_of']
+
+
+# Bump this if what is stored changes; older caches are then cleared
+CACHE_FORMAT = 3
+
+
+class ResultCache(object):
+    """
+    Validation results stored in an SQLite database along with the signatures
+    of the files and directories they depend on (see ``Package.inputs()``).
+
+    A stored result is only used if none of those have changed and it was
+    produced by the same version of the Development Toolkit in the same
+    language, with the same rule packs.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = config.settings_path('validationcache.sqlite')
+        self.filename = filename
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.stored = 0
+        self._rules = rule_packs_signature()
+        self._db = sqlite3.connect(filename)
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != \
+                CACHE_FORMAT:
+            self._db.execute('DROP TABLE IF EXISTS results')
+            self._db.execute('PRAGMA user_version = %i' % CACHE_FORMAT)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS results (
+                package TEXT NOT NULL,
+                toolkit_version TEXT NOT NULL,
+                language TEXT NOT NULL,
+                rules TEXT NOT NULL,
+                inputs TEXT NOT NULL,
+                errors TEXT NOT NULL,
+                warnings TEXT NOT NULL,
+                info TEXT NOT NULL,
+                PRIMARY KEY (package, toolkit_version, language, rules))''')
+
+    def _key(self, path):
+        return (os.path.normcase(os.path.abspath(path)),
+                config.padt_version_info,
+                config.get('Main', 'Language', 'english').lower(),
+                self._rules)
+
+    def get(self, path):
+        """
+        Get the validation results for a package as a tuple (errors, warnings,
+        info), or None if there are no results or the package has changed.
+        """
+        row = self._db.execute('''SELECT inputs, errors, warnings, info
+                FROM results WHERE package = ? AND toolkit_version = ? AND
+                language = ? AND rules = ?''', self._key(path)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+
+        for input_path, signature in json.loads(row[0]):
+            # Stored signatures with a hash have three items
+            current = file_signature(input_path,
+                    signature is not None and len(signature) == 3)
+            if current is not None:
+                current = list(current)
+            if current != signature:
+                self.misses += 1
+                self.stale += 1
+                return None
+
+        self.hits += 1
+        return tuple([ValidatorItem.from_dict(item)
+            for item in json.loads(column)] for column in row[1:])
+
+    def store(self, path, results):
+        """
+        Store the validation results of a package, as given by
+        ``results_of()``.
+        """
+        self._db.execute('''INSERT OR REPLACE INTO results
+                (package, toolkit_version, language, rules, inputs, errors,
+                warnings, info) VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                self._key(path) + tuple(json.dumps(results[column])
+                    for column in ('inputs', 'errors', 'warnings', 'info')))
+        self._db.commit()
+        self.stored += 1
+
+    def stats(self):
+        """Get a summary of how the cache has been used, for printing."""
+        entries = self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return ('Validation cache %s: %i entries; %i hits, %i misses '
+                '(%i stale), %i stored' % (self.filename, entries, self.hits,
+                    self.misses, self.stale, self.stored))
+
+    def close(self):
+        self._db.close()
+
+
+def results_of(package):
+    """
+    Get the validation results of a ``Package`` in a form suitable for
+    storing in a ``ResultCache`` (and JSON-serialisable): a dictionary with
+    the keys ``inputs`` (a list of [path, signature] pairs), ``errors``,
+    ``warnings`` and ``info`` (lists of ``ValidatorItem.to_dict()``
+    dictionaries).
+    """
+    return {
+            'inputs': [(path, file_signature(path, package.hash_inputs))
+                for path in package.inputs()],
+            'errors': [item.to_dict() for item in package.errors],
+            'warnings': [item.to_dict() for item in package.warnings],
+            'info': [item.to_dict() for item in package.info],
+            }
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fix an app package, or all the app packages in a directory (in parallel),
+from the command line.
+"""
+
+import sys
+from multiprocessing import Pool, cpu_count
+import paf
+from cli.batch import find_packages
+
+
+__all__ = ['fix']
+
+
+def _fix(args):
+    """
+    Fix a package (in a worker process). Returns a tuple of the path, the
+    diffs from ``Package.fix()`` or None for a critical error, and the
+    critical error message or None.
+    """
+    path, dry_run = args
+    try:
+        return path, paf.Package(path).fix(dry_run), None
+    except (paf.PAFException, EnvironmentError) as msg:
+        return path, None, unicode(msg)
+
+
+def fix(path, repository=False, dry_run=False, processes=None,
+        out=sys.stdout):
+    """
+    Fix the package ``path`` or, with ``repository`` set, all the packages in
+    the directory ``path``, on a pool of ``processes`` worker processes (by
+    default, one per processor).
+
+    Each INI file is written once with all the edits for it; with
+    ``dry_run`` set nothing is changed, and the edits which would be made are
+    written to ``out`` as a unified diff. Otherwise, the INI files which are
+    changed are listed.
+
+    The return value is an exit code: 3 if any package couldn't be fixed
+    because of a critical error, otherwise 0.
+    """
+
+    paths = find_packages(path) if repository else [path]
+    jobs = [(package, dry_run) for package in paths]
+    if len(jobs) == 1:
+        results = [_fix(jobs[0])]
+        pool = None
+    else:
+        pool = Pool(processes or cpu_count())
+        # In order, so that the diff doesn't depend on which finished first
+        results = pool.imap(_fix, jobs)
+
+    exit_code = 0
+    try:
+        for package, diffs, critical in results:
+            if critical is not None:
+                print >> sys.stderr, '%s: %s' % (package, critical)
+                exit_code = 3
+                continue
+            for filename, diff in diffs:
+                if dry_run:
+                    out.write(diff.encode('utf-8'))
+                else:
+                    print >> out, 'Fixed %s' % filename
+    except KeyboardInterrupt:
+        if pool is not None:
+            pool.terminate()
+        raise
+    else:
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is not None:
+            pool.join()
+
+    return exit_code
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""
+Index the app packages in a directory and check them against each other from
+the command line.
+"""
+
+import ConfigParser
+import iniparse
+import paf
+from languages import LANG
+from cli.validate import exit_code
+
+
+__all__ = ['index']
+
+
+def index(repository, update_ini=None, package_index=None):
+    """
+    Bring the index of the packages in the directory ``repository`` up to
+    date and run the repository checks (see ``paf.repository_checks``),
+    comparing categories with the update.ini file ``update_ini`` if given.
+    ``package_index`` is the ``PackageIndex`` to use (by default, the one in
+    the settings directory).
+
+    The return value is an exit code, as for ``cli.validate.validate``.
+    """
+    if update_ini is not None:
+        try:
+            with open(update_ini) as f:
+                update_ini = iniparse.INIConfig(f)
+        except (IOError, ConfigParser.Error) as msg:
+            print LANG.VALIDATION.CRITICAL % msg
+            return 3
+
+    if package_index is None:
+        package_index = paf.PackageIndex()
+    try:
+        indexed, removed = package_index.update(repository)
+        errors, warnings = paf.repository_checks(package_index, repository,
+                update_ini)
+        print 'Indexed %i packages in %s: %i updated, %i removed' % (
+                len(package_index.packages(repository)), repository,
+                indexed, removed)
+    finally:
+        package_index.close()
+    print
+
+    for heading, items in ((LANG.VALIDATION.STR_ERRORS, errors),
+            (LANG.VALIDATION.STR_WARNINGS, warnings)):
+        if items:
+            print heading + ':'
+            print '-' * (len(heading) + 1)
+            print
+            for item in items:
+                print unicode(item)
+            print
+
+    return exit_code(errors, warnings)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""
+Answer questions about the app packages in a directory from the command line,
+from the package index (see ``paf.PackageIndex``) rather than by opening every
+package.
+"""
+
+import re
+import sys
+import paf
+
+
+__all__ = ['query', 'parse_condition']
+
+
+_CONDITION = re.compile(r'([A-Za-z0-9_.]+)(<=|>=|!=|=|<|>)(.*)\Z')
+
+
+def parse_condition(condition):
+    """
+    Parse a condition like ``Category=Development`` or
+    ``Version.PackageVersion<2.0.0.0`` into a tuple (field, operator, value)
+    for ``PackageIndex.query()``. Raises ``ValueError`` if it isn't one.
+    """
+    match = _CONDITION.match(condition)
+    if match is None:
+        raise ValueError('Invalid condition: %s' % condition)
+    return match.groups()
+
+
+def query(repository, conditions, sort=None, reverse=False, limit=None,
+        fields=None, sizes=False, refresh_sizes=False, package_index=None,
+        out=sys.stdout):
+    """
+    Bring the index of the packages in the directory ``repository`` up to
+    date (working out installed sizes with ``sizes`` set, or if the
+    ``InstallSize`` field is used, and working them all out again with
+    ``refresh_sizes`` set) and list the packages which meet all the
+    ``conditions`` (strings, see ``parse_condition``), sorted by the field
+    ``sort``, largest first with ``reverse`` set, at most ``limit`` of them.
+
+    Each package is written to ``out`` on a line of its own: its path and the
+    ``fields`` (by default, the AppID and any fields in the conditions or
+    sorted by), separated by tabs.
+
+    The return value is an exit code: 0 if any packages were found, 1 if
+    none were and 3 if a condition isn't valid.
+    """
+    try:
+        conditions = [parse_condition(condition) for condition in conditions]
+    except ValueError as msg:
+        print >> sys.stderr, msg
+        return 3
+
+    if fields is None:
+        fields = ['AppID']
+        for field in [field for field, operator, value in conditions] + \
+                ([sort] if sort is not None else []):
+            if field not in fields and field != 'Path':
+                fields.append(field)
+
+    if refresh_sizes or 'InstallSize' in fields or sort == 'InstallSize' or any(
+            field == 'InstallSize' for field, operator, value in conditions):
+        sizes = True
+
+    if package_index is None:
+        package_index = paf.PackageIndex()
+    try:
+        package_index.update(repository, sizes, refresh_sizes)
+        results = package_index.query(repository, conditions, sort, reverse,
+                limit)
+    finally:
+        package_index.close()
+
+    for values in results:
+        line = [values['Path']]
+        for field in fields:
+            value = paf.PackageIndex.field(values, field)
+            line.append(unicode(value) if value is not None else '')
+        out.write(('\t'.join(line) + '\n').encode('utf-8'))
+
+    return 0 if results else 1
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+
+"""
+A state file recording, for each package, a quick fingerprint and the results
+of its last validation, so that a run over a large directory of packages can
+skip those which haven't changed without opening them.
+"""
+
+import os
+import sys
+import json
+from glob import glob
+from os.path import join
+import config
+from utils import file_signature, atomic_write
+from validator.rules import rule_packs_signature
+
+
+__all__ = ['RepositoryState', 'fingerprint']
+
+
+# Bump this if what is stored changes; older state files are then ignored
+STATE_FORMAT = 1
+
+# The paths in a package which are looked at for the fingerprint, besides the
+# launcher INI files. The directories will be modified if anything in them is
+# created, removed or renamed.
+FINGERPRINT_PATHS = (
+        (),
+        ('App',),
+        ('App', 'AppInfo'),
+        ('App', 'AppInfo', 'Launcher'),
+        ('Data',),
+        ('Other',),
+        ('Other', 'Source'),
+        ('App', 'AppInfo', 'appinfo.ini'),
+        ('App', 'AppInfo', 'appcompactor.ini'),
+        ('App', 'AppInfo', 'installer.ini'),
+        ('Other', 'Source', 'plugininstaller.ini'),
+        ('Other', 'Source', 'AppNamePortable.ini'),
+        )
+
+
+def fingerprint(path):
+    """
+    Get a quick fingerprint of the package ``path``: the signatures (see
+    ``utils.file_signature``) of its top-level directories and INI files.
+
+    This is much cheaper to get than the inputs of a validation (see
+    ``Package.inputs()``), but it is not as thorough: a file deep inside the
+    package being changed in place will not change it.
+    """
+    signatures = [file_signature(join(path, *name))
+            for name in FINGERPRINT_PATHS]
+    for filename in sorted(glob(join(path, 'App', 'AppInfo', 'Launcher',
+            '*.ini'))):
+        signatures.append(file_signature(filename))
+    # In the form it will have after a round trip through JSON
+    return [list(signature) if signature is not None else None
+            for signature in signatures]
+
+
+class RepositoryState(object):
+    """
+    The fingerprints and validation results of packages, stored in a JSON
+    file (by default, ``repositorystate.json`` in the settings directory).
+
+    The state is only used if it was saved by the same version of the
+    Development Toolkit in the same language, with the same rule packs;
+    otherwise it starts out empty.
+    Changes are only written when ``save()`` is called.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = config.settings_path('repositorystate.json')
+        self.filename = filename
+        self.unchanged = 0
+        self.changed = 0
+        self._packages = {}
+        # Fingerprints taken by get(), for store()
+        self._fingerprints = {}
+        self._rules = rule_packs_signature()
+        try:
+            with open(filename) as f:
+                state = json.load(f)
+        except (IOError, ValueError):
+            return
+        if isinstance(state, dict) and state.get('format') == STATE_FORMAT \
+                and state.get('toolkit_version') == self._toolkit_version() \
+                and state.get('language') == self._language() \
+                and state.get('rules') == self._rules:
+            self._packages = state['packages']
+
+    @staticmethod
+    def _key(path):
+        if isinstance(path, str):
+            # The keys come back from JSON as unicode
+            path = path.decode(sys.getfilesystemencoding())
+        return os.path.normcase(os.path.abspath(path))
+
+    @staticmethod
+    def _toolkit_version():
+        return unicode(config.padt_version_info)
+
+    @staticmethod
+    def _language():
+        return config.get('Main', 'Language', 'english').lower()
+
+    def get(self, path):
+        """
+        Get the results of the last validation of the package ``path`` if
+        its fingerprint hasn't changed since: a tuple of the results (a
+        dictionary with the keys ``errors``, ``warnings`` and ``info``, as
+        from ``cli.cache.results_of()``) or None, and the critical error
+        message or None. Returns None if the package has changed or isn't
+        known.
+        """
+        key = self._key(path)
+        entry = self._packages.get(key)
+        self._fingerprints[key] = current = fingerprint(path)
+        if entry is None or entry['fingerprint'] != current:
+            self.changed += 1
+            return None
+        self.unchanged += 1
+        return entry['results'], entry['critical']
+
+    def store(self, path, results, critical=None):
+        """
+        Record the results of validating the package ``path`` (as for
+        ``get()``) along with its fingerprint.
+
+        The fingerprint is the one ``get()`` took before the package was
+        validated, if it was called, so that a package which changes while
+        it is being validated will be validated again next time.
+        """
+        if results is not None:
+            results = dict((column, results[column])
+                    for column in ('errors', 'warnings', 'info'))
+        key = self._key(path)
+        self._packages[key] = {
+                'fingerprint': self._fingerprints.pop(key, None) or
+                    fingerprint(path),
+                'results': results,
+                'critical': critical,
+                }
+
+    def prune(self, directory, paths):
+        """
+        Forget the packages in ``directory`` which aren't in ``paths`` (the
+        packages found in it now).
+        """
+        prefix = join(self._key(directory), '')
+        keep = set(self._key(path) for path in paths)
+        for key in self._packages.keys():
+            if key.startswith(prefix) and key not in keep:
+                del self._packages[key]
+
+    def save(self):
+        """Write the state file."""
+        atomic_write(self.filename, json.dumps({
+            'format': STATE_FORMAT,
+            'toolkit_version': self._toolkit_version(),
+            'language': self._language(),
+            'rules': self._rules,
+            'packages': self._packages,
+            }))
+
+    def stats(self):
+        """Get a summary of how the state has been used, for printing."""
+        return ('Repository state %s: %i packages; %i unchanged, %i changed'
+                % (self.filename, len(self._packages), self.unchanged,
+                    self.changed))
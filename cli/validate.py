@@ -4,11 +4,15 @@
 Validate an app package in PortableApps.com Format from the command line.
 """
 
+import sys
 import paf
 from languages import LANG
+from cli.cache import results_of
+from validator.engine import ValidatorItem
+from validator.export import to_json, to_sarif
 
 
-__all__ = ['validate']
+__all__ = ['validate', 'exit_code']
 
 
 def _escape_rst(string, process):
@@ -19,10 +23,30 @@ def _escape_rst(string, process):
         return string.replace('\\', '\\\\')
 
 
-def validate(path, rst=False):
+_exporters = {'json': to_json, 'sarif': to_sarif}
+
+
+def validate(path, rst=False, cache=None, output_format='text',
+        profile=False, state=None):
     """
     Validate a package.
 
+    The results are printed as text (reStructuredText if ``rst`` is set), or
+    with ``output_format`` set to ``json`` or ``sarif``, in that format (see
+    ``validator.export``).
+
+    If a ``ResultCache`` is given as ``cache``, results are taken from it if
+    the package hasn't changed since it was last validated, and stored in it
+    if the package has to be validated.
+
+    If a ``RepositoryState`` is given as ``state``, the results of the last
+    validation are taken from it if the package's fingerprint hasn't changed
+    since, without opening the package; otherwise the state is updated (but
+    not saved) with the new results.
+
+    With ``profile`` set, the package is always validated and a profile of
+    validation is printed after the results (on stderr for JSON and SARIF).
+
     The return value is an exit code.
 
     A return value of 3 indicates critical errors in loading the package.
@@ -34,14 +58,50 @@ def validate(path, rst=False):
     A return value of 0 indicates success.
     """
 
-    try:
-        app = paf.Package(path)
-    except paf.PAFException as msg:
-        print LANG.VALIDATION.CRITICAL % msg
+    app = None
+    critical = None
+    previous = state.get(path) if state is not None and not profile else None
+    if previous is not None:
+        results, critical = previous
+        if results is not None:
+            results = tuple([ValidatorItem.from_dict(item)
+                for item in results[column]]
+                for column in ('errors', 'warnings', 'info'))
+    else:
+        results = cache.get(path) if cache is not None and not profile \
+                else None
+        if results is None:
+            try:
+                app = paf.Package(path, profile=profile)
+            except paf.PAFException as msg:
+                critical = unicode(msg)
+            else:
+                results = app.errors, app.warnings, app.info
+                if cache is not None:
+                    cache.store(path, results_of(app))
+        if state is not None:
+            state.store(path, None if results is None else
+                    dict(zip(('errors', 'warnings', 'info'),
+                        [[item.to_dict() for item in items]
+                            for items in results])), critical)
+
+    if critical is not None:
+        if output_format != 'text':
+            print _exporters[output_format]([(path, None, critical)])
+        else:
+            print LANG.VALIDATION.CRITICAL % critical
         return 3
 
-    error_count = len(app.errors)
-    warning_count = len(app.warnings)
+    errors, warnings, info = results
+
+    if output_format != 'text':
+        print _exporters[output_format]([(path, results, None)])
+        if profile:
+            print >> sys.stderr, app.profiler.report()
+        return exit_code(errors, warnings)
+
+    error_count = len(errors)
+    warning_count = len(warnings)
     params = {
             'numerrors': error_count,
             'numwarnings': warning_count,
@@ -63,7 +123,7 @@ def validate(path, rst=False):
         print LANG.VALIDATION.STR_ERRORS + ':'
         print '-' * (len(LANG.VALIDATION.STR_ERRORS) + 1)
         print
-        for item in app.errors:
+        for item in errors:
             if rst: print '-',
             print _escape_rst(item, rst)
         print
@@ -72,23 +132,35 @@ def validate(path, rst=False):
         print LANG.VALIDATION.STR_WARNINGS + ':'
         print '-' * (len(LANG.VALIDATION.STR_WARNINGS) + 1)
         print
-        for item in app.warnings:
+        for item in warnings:
             if rst: print '-',
             print _escape_rst(item, rst)
         print
 
-    if len(app.info):
+    if len(info):
         print LANG.VALIDATION.STR_INFORMATION + ':'
         print '-' * (len(LANG.VALIDATION.STR_INFORMATION) + 1)
         print
-        for item in app.info:
+        for item in info:
             if rst: print '-',
             print _escape_rst(item, rst)
         print
 
-    if error_count:
+    if profile:
+        print app.profiler.report()
+        print
+
+    return exit_code(errors, warnings)
+
+
+def exit_code(errors, warnings):
+    """
+    Get the exit code for validation results (other than a critical error):
+    2 for errors, 1 for warnings only and 0 for success.
+    """
+    if errors:
         return 2
-    elif warning_count:
+    elif warnings:
         return 1
     else:
         return 0
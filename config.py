@@ -3,7 +3,7 @@
 import os
 import sys
 from iniparse import tidy
-from utils import get_ini_str, iniopen
+from utils import get_ini_str, iniopen, atomic_write
 
 ROOT_DIR = os.path.abspath(os.path.dirname(unicode(sys.executable
     if hasattr(sys, 'frozen') else __file__, sys.getfilesystemencoding())))
@@ -37,8 +37,8 @@ def load():
 def save():
     """Save the user's settings."""
     tidy(settings)
-    with open(settings_path('settings.ini'), 'w') as outfile:
-        outfile.write(unicode(settings))
+    atomic_write(settings_path('settings.ini'), unicode(settings),
+            if_changed=True)
 
 
 def get(section, key, default=None):
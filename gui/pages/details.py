@@ -1,6 +1,6 @@
 from PyQt4 import QtCore, QtGui
 from iniparse.config import Undefined
-from paf.appinfo import valid_appid
+from paf.appinfo import valid_appid, appid_for_name
 from ._base import WindowPage
 from ..ui.pagedetails import Ui_PageDetails
 
@@ -77,13 +77,7 @@ class PageDetails(WindowPage, Ui_PageDetails):
         else:
             name = value
 
-        # AppID for Whatever, Portable Edition is still WhateverPortable
-        appid = value
-        if appid.endswith(', Portable Edition'):
-            appid = appid[:-len(', Portable Edition')] + ' Portable'
-
-        # Correct it (don't care about whether it was valid)
-        appid = valid_appid(appid)[1]
+        appid = appid_for_name(value)
 
         if 'AppID' not in self.appinfo.Details and \
         not self.AppID.isModified():
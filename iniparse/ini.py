@@ -42,16 +42,28 @@ Example:
 # Backward-compatiable with ConfigParser
 
 import re
+from collections import OrderedDict
 from ConfigParser import DEFAULTSECT, ParsingError, MissingSectionHeaderError
 
 import config
 
+# Sets an attribute without going through LineType.__setattr__, for use in
+# __init__ methods, where nothing has been modified yet.
+_initattr = object.__setattr__
+
+
+# Line objects use __slots__ rather than a __dict__, as there is one for
+# every line of a file and large files have tens of thousands of lines.
 class LineType(object):
-    line = None
+    # section is the SectionContainer the line is in, if any, which is marked
+    # dirty when the line is changed
+    __slots__ = ('line', 'section')
 
     def __init__(self, line=None):
         if line is not None:
-            self.line = line.strip('\n')
+            line = line.strip('\n')
+        _initattr(self, 'line', line)
+        _initattr(self, 'section', None)
 
     # Return the original line for unmodified objects
     # Otherwise construct using the current attribute values
@@ -65,14 +77,18 @@ class LineType(object):
     # set line to None since it is no longer accurate.
     def __setattr__(self, name, value):
         if hasattr(self,name):
-            self.__dict__['line'] = None
-        self.__dict__[name] = value
+            _initattr(self, 'line', None)
+        _initattr(self, name, value)
+        if self.section is not None:
+            self.section.mark_dirty()
 
     def to_string(self):
         raise Exception('This method must be overridden in derived classes')
 
 
 class SectionLine(LineType):
+    __slots__ = ('name', 'comment', 'comment_separator', 'comment_offset')
+
     regex =  re.compile(r'^\['
                         r'(?P<name>[^]]+)'
                         r'\]\s*'
@@ -80,11 +96,11 @@ class SectionLine(LineType):
 
     def __init__(self, name, comment=None, comment_separator=None,
                              comment_offset=-1, line=None):
-        super(SectionLine, self).__init__(line)
-        self.name = name
-        self.comment = comment
-        self.comment_separator = comment_separator
-        self.comment_offset = comment_offset
+        LineType.__init__(self, line)
+        _initattr(self, 'name', name)
+        _initattr(self, 'comment', comment)
+        _initattr(self, 'comment_separator', comment_separator)
+        _initattr(self, 'comment_offset', comment_offset)
 
     def to_string(self):
         out = '[' + self.name + ']'
@@ -105,15 +121,18 @@ class SectionLine(LineType):
 
 
 class OptionLine(LineType):
+    __slots__ = ('name', 'value', 'separator', 'comment', 'comment_separator',
+                 'comment_offset')
+
     def __init__(self, name, value, separator='=', comment=None,
                  comment_separator=None, comment_offset=-1, line=None):
-        super(OptionLine, self).__init__(line)
-        self.name = name
-        self.value = value
-        self.separator = separator
-        self.comment = comment
-        self.comment_separator = comment_separator
-        self.comment_offset = comment_offset
+        LineType.__init__(self, line)
+        _initattr(self, 'name', name)
+        _initattr(self, 'value', value)
+        _initattr(self, 'separator', separator)
+        _initattr(self, 'comment', comment)
+        _initattr(self, 'comment_separator', comment_separator)
+        _initattr(self, 'comment_offset', comment_offset)
 
     def to_string(self):
         out = '%s%s%s' % (self.name, self.separator, self.value)
@@ -163,21 +182,29 @@ class OptionLine(LineType):
 
 
 def change_comment_syntax(comment_chars='%;#', allow_rem=False):
+    first_chars = set(comment_chars)
     comment_chars = re.sub(r'([\]\-\^])', r'\\\1', comment_chars)
     regex = r'^(?P<csep>[%s]' % comment_chars
     if allow_rem:
         regex += '|[rR][eE][mM]'
+        first_chars.update('rR')
     regex += r')(?P<comment>.*)$'
     CommentLine.regex = re.compile(regex)
+    CommentLine.first_chars = frozenset(first_chars)
 
 class CommentLine(LineType):
+    __slots__ = ('comment', 'separator')
+
     regex = re.compile(r'^(?P<csep>[;#]|[rR][eE][mM])'
                        r'(?P<comment>.*)$')
+    # The characters regex can match at the start of a line (None for any),
+    # so INIConfig._parse can tell which lines can't be comments
+    first_chars = frozenset(';#rR')
 
     def __init__(self, comment='', separator='#', line=None):
-        super(CommentLine, self).__init__(line)
-        self.comment = comment
-        self.separator = separator
+        LineType.__init__(self, line)
+        _initattr(self, 'comment', comment)
+        _initattr(self, 'separator', separator)
 
     def to_string(self):
         return self.separator + self.comment
@@ -191,6 +218,8 @@ class CommentLine(LineType):
 
 
 class EmptyLine(LineType):
+    __slots__ = ()
+
     # could make this a singleton
     def to_string(self):
         return ''
@@ -204,14 +233,16 @@ class EmptyLine(LineType):
 
 
 class ContinuationLine(LineType):
+    __slots__ = ('value', 'value_offset')
+
     regex = re.compile(r'^\s+(?P<value>.*)$')
 
     def __init__(self, value, value_offset=None, line=None):
-        super(ContinuationLine, self).__init__(line)
-        self.value = value
+        LineType.__init__(self, line)
+        _initattr(self, 'value', value)
         if value_offset is None:
             value_offset = 8
-        self.value_offset = value_offset
+        _initattr(self, 'value_offset', value_offset)
 
     def to_string(self):
         return ' '*self.value_offset + self.value
@@ -225,19 +256,34 @@ class ContinuationLine(LineType):
 
 
 class LineContainer(object):
-    def __init__(self, d=None):
+    # section is the SectionContainer this is (or which this is in), if any;
+    # lines added to it are given the same one
+    __slots__ = ('contents', 'orgvalue', 'section')
+
+    def __init__(self, d=None, section=None):
         self.contents = []
         self.orgvalue = None
+        self.section = section
         if d:
             if isinstance(d, list): self.extend(d)
             else: self.add(d)
 
     def add(self, x):
         self.contents.append(x)
+        section = self.section
+        if section is not None:
+            if isinstance(x, LineContainer):
+                _set_section(x, section)
+            else:
+                _initattr(x, 'section', section)
 
     def extend(self, x):
         for i in x: self.add(i)
 
+    def mark_dirty(self):
+        # Nothing is cached here; see SectionContainer
+        pass
+
     def get_name(self):
         return self.contents[0].name
 
@@ -292,6 +338,44 @@ class LineContainer(object):
         raise KeyError(key)
 
 
+class SectionContainer(LineContainer):
+    """The LineContainer of a section in an INIConfig
+
+    Its text is kept once built, so that writing out a file after changing
+    a few sections only rebuilds the text of those.  The lines in it refer
+    back to it, and mark it dirty when they are changed; INISection and
+    tidy() mark it dirty when they change what lines it has.  Code which
+    changes `contents` itself must call mark_dirty().
+
+    `tidy` is set by iniparse.tidy() once the section is tidy, until it is
+    marked dirty.
+    """
+    __slots__ = ('_text', 'tidy')
+
+    def __init__(self, d=None):
+        self._text = None
+        self.tidy = False
+        LineContainer.__init__(self, d, section=self)
+
+    def mark_dirty(self):
+        self._text = None
+        self.tidy = False
+
+    def __str__(self):
+        if self._text is None:
+            self._text = LineContainer.__str__(self)
+        return self._text
+
+
+def _set_section(x, section):
+    # Record the SectionContainer a line or LineContainer (and the lines in
+    # it) is in
+    _initattr(x, 'section', section)
+    if isinstance(x, LineContainer):
+        for y in x.contents:
+            _set_section(y, section)
+
+
 def _make_xform_property(myattrname, srcattrname=None):
     private_attrname = myattrname + 'value'
     private_srcname = myattrname + 'source'
@@ -376,6 +460,8 @@ class INISection(config.ConfigNamespace):
         # the set_value() function in LineContainer
         # automatically handles multi-line values
         self._options[xkey].value = value
+        for l in self._lines:
+            l.mark_dirty()
 
     def __delitem__(self, key):
         if self._optionxform: key = self._optionxform(key)
@@ -391,6 +477,7 @@ class INISection(config.ConfigNamespace):
                 else:
                     remaining.append(o)
             l.contents = remaining
+            l.mark_dirty()
         del self._options[key]
 
     def __iter__(self):
@@ -449,9 +536,20 @@ def lower(x):
     return x.lower()
 
 
+# What \s matches in the line type regexes (which don't use re.UNICODE)
+_regex_whitespace = frozenset(' \t\n\r\f\v')
+
+
 class INIConfig(config.ConfigNamespace):
     _data = None
     _sections = None
+    # The names of the sections in order, as keys, so that iterating over
+    # them, counting them and deleting one doesn't mean going through _data
+    _section_names = None
+    # The LineContainers of deleted sections, which are left in _data until
+    # it is next gone through (see _drop_deleted), as taking each one out of
+    # it would mean going through it
+    _deleted = None
     _defaults = None
     _optionxformvalue = None
     _optionxformsource = None
@@ -469,6 +567,8 @@ class INIConfig(config.ConfigNamespace):
         self._sectionxformvalue = sectionxformvalue
         self._sectionxformsource = sectionxformsource
         self._sections = {}
+        self._section_names = OrderedDict()
+        self._deleted = set()
         if defaults is None: defaults = {}
         self._defaults = INISection(LineContainer(), optionxformsource=self)
         for name, value in defaults.iteritems():
@@ -491,29 +591,40 @@ class INIConfig(config.ConfigNamespace):
     def __delitem__(self, key):
         if self._sectionxform: key = self._sectionxform(key)
         for line in self._sections[key]._lines:
-            self._data.contents.remove(line)
+            self._deleted.add(line)
+            # Every section line with this name is in this section
+            self._section_names.pop(line.name, None)
         del self._sections[key]
 
+    def _drop_deleted(self):
+        # Take the LineContainers of deleted sections out of _data; this must
+        # be called before going through _data.contents
+        if self._deleted:
+            deleted = self._deleted
+            self._data.contents = [x for x in self._data.contents
+                                   if x not in deleted]
+            self._deleted = set()
+
     def __iter__(self):
-        d = set()
-        d.add(DEFAULTSECT)
-        for x in self._data.contents:
-            if isinstance(x, LineContainer):
-                if x.name not in d:
-                    yield x.name
-                    d.add(x.name)
+        return iter(self._section_names)
 
     def __len__(self):
-        len_ = 0
-        for i in self:
-            len_ += 1
-        return len_
+        return len(self._section_names)
+
+    def _add_section_line(self, obj):
+        # Add a section's LineContainer to _data, keeping _section_names up to
+        # date; the name is listed where it first appears
+        self._data.add(obj)
+        name = obj.name
+        if name != DEFAULTSECT and name not in self._section_names:
+            self._section_names[name] = None
 
     def _new_namespace(self, name):
-        if self._data.contents:
+        # Whether anything but deleted sections is left
+        if len(self._data.contents) > len(self._deleted):
             self._data.add(EmptyLine())
-        obj = LineContainer(SectionLine(name))
-        self._data.add(obj)
+        obj = SectionContainer(SectionLine(name))
+        self._add_section_line(obj)
         if self._sectionxform: name = self._sectionxform(name)
         if name in self._sections:
             ns = self._sections[name]
@@ -529,6 +640,7 @@ class INIConfig(config.ConfigNamespace):
             fmt = u'\ufeff%s'
         else:
             fmt = '%s'
+        self._drop_deleted()
         return fmt % self._data.__str__()
 
     __unicode__ = __str__
@@ -538,13 +650,35 @@ class INIConfig(config.ConfigNamespace):
                    ContinuationLine]
 
     def _parse(self, line):
-        for linetype in self._line_types:
-            lineobj = linetype.parse(line)
+        if self._line_types is not INIConfig._line_types:
+            for linetype in self._line_types:
+                lineobj = linetype.parse(line)
+                if lineobj:
+                    return lineobj
+            else:
+                # can't parse line
+                return None
+
+        # With the standard line types, the first character of a line rules
+        # out all but one or two of them, so only those are tried (in the
+        # same order) rather than running every regex on it.
+        if not line.strip():
+            return EmptyLine(line)
+        first = line[0]
+        comment_chars = CommentLine.first_chars
+        if comment_chars is None or first in comment_chars:
+            lineobj = CommentLine.parse(line)
             if lineobj:
                 return lineobj
-        else:
+        if first == '[':
+            return SectionLine.parse(line)
+        elif first in _regex_whitespace:
+            return ContinuationLine.parse(line)
+        elif first == ':' or first == '=':
             # can't parse line
             return None
+        else:
+            return OptionLine.parse(line)
 
     def _readfp(self, fp):
         cur_section = None
@@ -621,8 +755,8 @@ class INIConfig(config.ConfigNamespace):
                 self._data.extend(pending_lines)
                 pending_lines = []
                 pending_empty_lines = False
-                cur_section = LineContainer(lineobj)
-                self._data.add(cur_section)
+                cur_section = SectionContainer(lineobj)
+                self._add_section_line(cur_section)
                 cur_option = None
                 cur_option_name = None
                 if cur_section.name == DEFAULTSECT:
@@ -1,5 +1,6 @@
+from itertools import islice
 import compat
-from ini import LineContainer, EmptyLine
+from ini import LineContainer, SectionContainer, EmptyLine
 
 def tidy(cfg):
     """Clean up blank lines.
@@ -12,36 +13,64 @@ def tidy(cfg):
 
     if isinstance(cfg, compat.RawConfigParser):
         cfg = cfg.data
+    cfg._drop_deleted()
     cont = cfg._data.contents
-    i = 1
-    while i < len(cont):
-        if isinstance(cont[i], LineContainer):
-            tidy_section(cont[i])
-            i += 1
-        elif (isinstance(cont[i-1], EmptyLine) and
-              isinstance(cont[i], EmptyLine)):
-            del cont[i]
+    if not cont:
+        return
+
+    # Build the new contents in one pass, rather than deleting lines one at
+    # a time, which is quadratic in the number of lines
+    tidied = [cont[0]]
+    previous_empty = isinstance(cont[0], EmptyLine)
+    for x in islice(cont, 1, None):
+        if isinstance(x, LineContainer):
+            tidy_section(x)
+            previous_empty = False
+        elif isinstance(x, EmptyLine):
+            if previous_empty:
+                continue
+            previous_empty = True
         else:
-            i += 1
+            previous_empty = False
+        tidied.append(x)
 
     # Remove empty first line
-    if cont and isinstance(cont[0], EmptyLine):
-        del cont[0]
+    if isinstance(tidied[0], EmptyLine):
+        del tidied[0]
 
     # Ensure a last line
-    if cont and not isinstance(cont[-1], EmptyLine):
-        cont.append(EmptyLine())
+    if tidied and not isinstance(tidied[-1], EmptyLine):
+        tidied.append(EmptyLine())
+
+    cont[:] = tidied
 
 def tidy_section(lc):
+    # A section which hasn't changed since it was last tidied is still tidy
+    is_section = isinstance(lc, SectionContainer)
+    if is_section and lc.tidy:
+        return
+
     cont = lc.contents
-    i = 1
-    while i < len(cont):
-        if (isinstance(cont[i-1], EmptyLine) and
-            isinstance(cont[i], EmptyLine)):
-            del cont[i]
-        else:
-            i += 1
+    if len(cont) > 1:
+        tidied = [cont[0]]
+        previous_empty = isinstance(cont[0], EmptyLine)
+        for x in islice(cont, 1, None):
+            if isinstance(x, EmptyLine):
+                if previous_empty:
+                    continue
+                previous_empty = True
+            else:
+                previous_empty = False
+            tidied.append(x)
 
-    # Remove empty first line
-    if len(cont) > 1 and isinstance(cont[1], EmptyLine):
-        del cont[1]
+        # Remove empty first line
+        if len(tidied) > 1 and isinstance(tidied[1], EmptyLine):
+            del tidied[1]
+
+        # Lines are only ever removed, so the same length means no change
+        if len(tidied) != len(cont):
+            cont[:] = tidied
+            lc.mark_dirty()
+
+    if is_section:
+        lc.tidy = True
@@ -6,6 +6,7 @@ Main launch script for PortableApps.com Development Toolkit.
 """
 
 import sys
+import multiprocessing
 import pyqt4pysideimporter
 pyqt4pysideimporter.autoselect()
 from PyQt4 import QtGui
@@ -51,7 +52,51 @@ def cli_help(*args):
     print '  %s validate <package>' % sys.argv[0]
     print
     print 'Validate a package (command line):'
-    print '  %s validate-cli <package>' % sys.argv[0]
+    print '  %s validate-cli [--no-cache] [--cache-stats] [--format=F] ' \
+            '[--profile] [--changed-only[=FILE]] <package>' % sys.argv[0]
+    print
+    print 'Validate all packages in a directory (command line, JSON Lines):'
+    print '  %s batch [--no-cache] [--cache-stats] [--processes=N] ' \
+            '[--changed-only[=FILE]] <dir>' % sys.argv[0]
+    print
+    print 'Fix a package, or with --all every package in a directory:'
+    print '  %s fix [--dry-run] [--all] [--processes=N] <package or dir>' % \
+            sys.argv[0]
+    print
+    print 'Index all packages in a directory and check them against each other:'
+    print '  %s index [--update-ini=FILE] <dir>' % sys.argv[0]
+    print
+    print 'List the packages in a directory meeting conditions (e.g. ' \
+            'Category=Development,'
+    print 'UsesJava=yes, PackageVersion<2.0.0.0), from the package index:'
+    print '  %s query [--sort=FIELD] [--reverse] [--limit=N] ' \
+            '[--fields=F1,F2] [--sizes] [--refresh-sizes] <dir> ' \
+            '[<condition>...]' % sys.argv[0]
+    print
+    print 'Command line options:'
+    print '  --no-cache     always validate, ignoring the validation cache'
+    print '  --cache-stats  print validation cache statistics at the end'
+    print '  --processes=N  validate N packages at a time (default: number of'
+    print '                 processors)'
+    print '  --format=F     output format: text (default), json or sarif'
+    print '  --profile      print how long each check took'
+    print '  --changed-only[=FILE]  reuse the last results for packages ' \
+            'whose top-level'
+    print '                 directories and INI files haven\'t changed, ' \
+            'without opening'
+    print '                 them; the state is kept in FILE (default:'
+    print '                 repositorystate.json in the settings directory)'
+    print '  --dry-run      print the changes as a diff rather than making them'
+    print '  --update-ini=FILE  check categories against an update.ini file'
+    print '  --sort=FIELD   sort by a field (Key or Section.Key from ' \
+            'appinfo.ini, Path or'
+    print '                 InstallSize), --reverse for largest first'
+    print '  --limit=N      list at most N packages'
+    print '  --fields=F1,F2 the fields to list (default: AppID and those used)'
+    print '  --sizes        work out installed sizes (InstallSize)'
+    print '  --refresh-sizes  work out all the installed sizes again, for ' \
+            'files changed'
+    print '                 in place'
     return 0
 
 
@@ -60,10 +105,164 @@ def validate_gui(command, path):
     return main(path, 'test')
 
 
-def validate_cli(command, path):
+def split_options(args):
+    """
+    Split command line arguments into a dictionary of options (``--name`` or
+    ``--name=value``; the value is True if not given) and a list of the other
+    arguments.
+    """
+    options = {}
+    others = []
+    for arg in args:
+        if arg.startswith('--'):
+            name, equals, value = arg.partition('=')
+            options[name] = value if equals else True
+        else:
+            others.append(arg)
+    return options, others
+
+
+def processes_option(options):
+    """
+    Get the number of worker processes given with ``--processes=N``, or None
+    if it wasn't given. Raises ValueError unless N is a whole number of at
+    least one.
+    """
+    if '--processes' not in options:
+        return None
+    processes = options['--processes']
+    if processes is True or int(processes) < 1:
+        raise ValueError(processes)
+    return int(processes)
+
+
+def repository_state(options):
+    """
+    Get the ``RepositoryState`` for the ``--changed-only`` option, or None if
+    it wasn't given.
+    """
+    from cli.state import RepositoryState
+    if '--changed-only' not in options:
+        return None
+    elif options['--changed-only'] is True:
+        return RepositoryState()
+    else:
+        return RepositoryState(options['--changed-only'])
+
+
+def validate_cli(command, *args):
     """Just run the validator (command-line version)."""
     from cli.validate import validate
-    return validate(path)
+    from cli.cache import ResultCache
+    options, paths = split_options(args)
+    if len(paths) != 1 or set(options) - set(['--no-cache', '--cache-stats',
+            '--format', '--profile', '--changed-only']):
+        return cli_help()
+
+    output_format = options.get('--format', 'text')
+    if output_format not in ('text', 'json', 'sarif'):
+        return cli_help()
+
+    cache = None if '--no-cache' in options else ResultCache()
+    state = repository_state(options)
+    exit_code = validate(paths[0], cache=cache, output_format=output_format,
+            profile='--profile' in options, state=state)
+    if state is not None:
+        state.save()
+        if '--cache-stats' in options:
+            if output_format == 'text':
+                print state.stats()
+            else:
+                # stdout is for the JSON
+                print >> sys.stderr, state.stats()
+    if cache is not None:
+        if '--cache-stats' in options:
+            if output_format == 'text':
+                print cache.stats()
+            else:
+                # stdout is for the JSON
+                print >> sys.stderr, cache.stats()
+        cache.close()
+    return exit_code
+
+
+def batch_cli(command, *args):
+    """Validate all packages in a directory, writing JSON Lines."""
+    from cli.batch import batch
+    from cli.cache import ResultCache
+    options, paths = split_options(args)
+    if len(paths) != 1 or set(options) - set(['--no-cache', '--cache-stats',
+            '--processes', '--changed-only']):
+        return cli_help()
+
+    try:
+        processes = processes_option(options)
+    except ValueError:
+        return cli_help()
+
+    cache = None if '--no-cache' in options else ResultCache()
+    state = repository_state(options)
+    exit_code = batch(paths[0], processes, cache, state)
+    if state is not None:
+        state.save()
+        if '--cache-stats' in options:
+            print >> sys.stderr, state.stats()
+    if cache is not None:
+        if '--cache-stats' in options:
+            # stdout is for the JSON
+            print >> sys.stderr, cache.stats()
+        cache.close()
+    return exit_code
+
+
+def fix_cli(command, *args):
+    """Fix a package or all packages in a directory."""
+    from cli.fix import fix
+    options, paths = split_options(args)
+    if len(paths) != 1 or set(options) - set(['--dry-run', '--all',
+            '--processes']):
+        return cli_help()
+
+    try:
+        processes = processes_option(options)
+    except ValueError:
+        return cli_help()
+
+    return fix(paths[0], '--all' in options, '--dry-run' in options,
+            processes)
+
+
+def index_cli(command, *args):
+    """Index all packages in a directory and run the repository checks."""
+    from cli.index import index
+    options, paths = split_options(args)
+    if len(paths) != 1 or set(options) - set(['--update-ini']) or \
+            options.get('--update-ini') is True:
+        return cli_help()
+
+    return index(paths[0], options.get('--update-ini'))
+
+
+def query_cli(command, *args):
+    """List the packages in a directory meeting conditions."""
+    from cli.query import query
+    options, args = split_options(args)
+    if not args or set(options) - set(['--sort', '--reverse', '--limit',
+            '--fields', '--sizes', '--refresh-sizes']) or \
+            any(options.get(name) is True
+                for name in ('--sort', '--limit', '--fields')):
+        return cli_help()
+
+    try:
+        limit = int(options['--limit']) if '--limit' in options else None
+    except ValueError:
+        return cli_help()
+
+    fields = options['--fields'].split(',') if '--fields' in options \
+            else None
+    return query(args[0], args[1:], options.get('--sort'),
+            '--reverse' in options, limit, fields, '--sizes' in options,
+            '--refresh-sizes' in options)
 
 
 def select_action():
@@ -74,11 +273,22 @@ def select_action():
         elif sys.argv[1] == 'validate':
             return len(sys.argv) == 3 and validate_gui or cli_help
         elif sys.argv[1] == 'validate-cli':
-            return len(sys.argv) == 3 and validate_cli or cli_help
+            return len(sys.argv) >= 3 and validate_cli or cli_help
+        elif sys.argv[1] == 'batch':
+            return len(sys.argv) >= 3 and batch_cli or cli_help
+        elif sys.argv[1] == 'fix':
+            return len(sys.argv) >= 3 and fix_cli or cli_help
+        elif sys.argv[1] == 'index':
+            return len(sys.argv) >= 3 and index_cli or cli_help
+        elif sys.argv[1] == 'query':
+            return len(sys.argv) >= 3 and query_cli or cli_help
         else:
             return main
     else:
         return main
 
 if __name__ == "__main__":
+    # For the batch validator's and fixer's worker processes in the frozen
+    # executable
+    multiprocessing.freeze_support()
     sys.exit(select_action()(*sys.argv[1:]))
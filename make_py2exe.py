@@ -77,6 +77,7 @@ data_files = find_data_files('', '', [
     # No need for resources/ - its own PAF stuff gets used for build only and
     # the images go in the QRC and so get built in
     'languages/*.ini',
+    'rules/*.ini',
     'app-template/*',
     'app-template/*/*',
     'app-template/*/*/*',
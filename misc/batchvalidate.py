@@ -1,15 +1,27 @@
 #!/usr/bin/env python
 
-"""Validate all packages in a given directory."""
+"""
+Validate all packages in a given directory.
+
+Usage: batchvalidate.py [--no-cache] [--cache-stats] <directory>
+
+Unless --no-cache is given, packages which haven't changed since they were
+last validated are not validated again; their results come from the
+validation cache.
+"""
 
 import os
 import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from cli.validate import validate
+from cli.cache import ResultCache
 
 
-for path in os.listdir(sys.argv[1]):
-    path = os.path.abspath(os.path.join(sys.argv[1], path))
+args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+cache = None if '--no-cache' in sys.argv else ResultCache()
+
+for path in os.listdir(args[0]):
+    path = os.path.abspath(os.path.join(args[0], path))
     if not os.path.isdir(path) or os.path.basename(path) == 'PortableApps.com':
         # Skip files and the "PortableApps.com" directory (Platform etc.)
         continue
@@ -17,4 +29,9 @@ for path in os.listdir(sys.argv[1]):
     print title
     print '=' * len(title)
     print
-    validate(os.path.abspath(path), rst=True)
+    validate(os.path.abspath(path), rst=True, cache=cache)
+
+if cache is not None:
+    if '--cache-stats' in sys.argv:
+        print cache.stats()
+    cache.close()
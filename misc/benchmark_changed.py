@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+'''
+Time validating a repository of synthetic packages when only a few of them
+have changed since the last run: validating everything, with the validation
+cache (which checks everything each package's results depend upon) and with
+the repository state of ``--changed-only`` (which only checks each package's
+top-level directories and INI files).
+
+Usage: benchmark_changed.py [<number of packages> [<number changed>]]
+
+The defaults are 1000 packages, 5 of them changed.
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shutil
+import tempfile
+import time
+from os.path import join
+from cli.batch import batch
+from cli.cache import ResultCache
+from cli.state import RepositoryState
+from benchmark_registry import create_packages
+
+
+def change_packages(repository, count, changed):
+    'Change the appinfo.ini files of ``changed`` of the packages.'
+    for i in range(0, count, max(count // changed, 1))[:changed]:
+        filename = join(repository, 'Package%iPortable' % i, 'App',
+                'AppInfo', 'appinfo.ini')
+        with open(filename, 'a') as f:
+            f.write('\n[Dependencies]\nUsesJava=no\n')
+        # Make sure the modification time differs
+        mtime = os.stat(filename).st_mtime + 2
+        os.utime(filename, (mtime, mtime))
+
+
+def timed_batch(repository, cache=None, state=None):
+    with open(os.devnull, 'w') as out:
+        start = time.time()
+        batch(repository, cache=cache, state=state, out=out)
+        seconds = time.time() - start
+    if state is not None:
+        state.save()
+    return seconds
+
+
+def main(count, changed):
+    directory = tempfile.mkdtemp()
+    try:
+        repository = join(directory, 'PortableApps')
+        os.mkdir(repository)
+        create_packages(repository, count)
+
+        cache = ResultCache(join(directory, 'cache.sqlite'))
+        state_file = join(directory, 'state.json')
+        timed_batch(repository, cache, RepositoryState(state_file))
+
+        change_packages(repository, count, changed)
+        full = timed_batch(repository)
+        cached = timed_batch(repository, cache)
+        # The cache is up to date now, so this only validates what the state
+        # says has changed
+        state = RepositoryState(state_file)
+        unchanged = timed_batch(repository, cache, state)
+        if state.changed != changed:
+            print 'Expected %i changed packages, found %i!' % (changed,
+                    state.changed)
+            sys.exit(1)
+        cache.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print '%-36s %10.2f s' % ('Validating everything', full)
+    print '%-36s %10.2f s' % ('With the validation cache', cached)
+    print '%-36s %10.2f s' % ('With --changed-only', unchanged)
+    print
+    print '(%i packages, %i changed.)' % (count, changed)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 or not all(arg.isdigit() for arg in sys.argv[1:]):
+        print __doc__.strip()
+        sys.exit(1)
+    main(*([int(arg) for arg in sys.argv[1:]] + [1000, 5][len(sys.argv) - 1:]))
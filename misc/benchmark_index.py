@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+
+'''
+Time finding a package by AppID in a repository of synthetic packages: by
+opening every package (as scripts have had to) and with the package index,
+including building the index from scratch and bringing it up to date when
+nothing has changed. A query of the index (as ``main.py query`` makes) is
+timed too.
+
+Usage: benchmark_index.py [<number of packages>]
+
+The default number of packages is 1000.
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shutil
+import tempfile
+import timeit
+from os.path import join
+import paf
+from benchmark_registry import create_packages
+
+
+def find_by_opening(directory, appid):
+    '''Find a package by AppID the old way, opening every package.'''
+    return [join(directory, name) for name in sorted(os.listdir(directory))
+            if paf.Package(join(directory, name), validate=False).appid
+            == appid]
+
+
+def main(count):
+    directory = tempfile.mkdtemp()
+    try:
+        repository = join(directory, 'PortableApps')
+        os.mkdir(repository)
+        create_packages(repository, count)
+        appid = 'Package%iPortable' % (count // 2)
+
+        index = paf.PackageIndex(join(directory, 'index.sqlite'))
+        build = timeit.timeit(lambda: index.update(repository), number=1)
+        update = min(timeit.repeat(lambda: index.update(repository),
+            number=1, repeat=3))
+        lookup = min(timeit.repeat(
+            lambda: index.by_appid(repository, appid), number=100,
+            repeat=3)) / 100
+        conditions = [('Category', '=', 'Utilities'),
+                ('PackageVersion', '<', '2.0.0.0')]
+        query = min(timeit.repeat(
+            lambda: index.query(repository, conditions, limit=10),
+            number=10, repeat=3)) / 10
+        opening = timeit.timeit(lambda: find_by_opening(repository, appid),
+                number=1)
+        if map(os.path.normcase, find_by_opening(repository, appid)) != \
+                index.by_appid(repository, appid):
+            print 'Results differ!'
+            sys.exit(1)
+        index.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print '%-36s %10.2f ms' % ('Opening every package', opening * 1000)
+    print '%-36s %10.2f ms' % ('Building the index', build * 1000)
+    print '%-36s %10.2f ms' % ('Updating the index (no changes)',
+            update * 1000)
+    print '%-36s %10.3f ms' % ('Looking up in the index', lookup * 1000)
+    print '%-36s %10.2f ms' % ('Querying the index', query * 1000)
+    print
+    print '(Finding one AppID among %i packages.)' % count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 or (len(sys.argv) == 2 and
+            not sys.argv[1].isdigit()):
+        print __doc__.strip()
+        sys.exit(1)
+    main(int(sys.argv[1]) if len(sys.argv) == 2 else 1000)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python
+
+'''
+Time parsing a large INI file with iniparse: the PortableApps.com update.ini
+if given, or otherwise a synthetic one like it. Parsing with the first
+character of each line picking the line type is compared with trying each
+line type in turn (as iniparse used to), checking that the results are the
+same, both for whole files and for just classifying each line.
+
+The memory the parsed file takes up is measured too: the total size of the
+line objects and the strings and lists they hold, and (where the resource
+module is available) how much parsing raises the peak memory use of a fresh
+process.
+
+Counting, listing and deleting sections are timed for synthetic files of
+different sizes, with INIConfig's index of section names and by going
+through every line of the file (as iniparse used to). With the index,
+deleting takes the same time whatever the size of the file, as the deleted
+sections are only taken out of its lines when it is next written out or
+tidied.
+
+tidy() is timed on a synthetic 50,000 line INI file with runs of blank
+lines, against deleting the extra blank lines one at a time (as iniparse
+used to).
+
+Finally, saving the file (tidying it and writing it out, as
+INIManager.save() does) is timed when the text of every section has to be
+built, after changing one key, and when nothing has changed and the file on
+disk is the same, so writing is skipped.
+
+Usage: benchmark_iniparse.py [<update.ini>]
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import subprocess
+import tempfile
+import timeit
+from StringIO import StringIO
+from ConfigParser import DEFAULTSECT
+from iniparse import INIConfig, tidy
+from iniparse.ini import LineContainer, EmptyLine
+import paf
+from utils import atomic_write
+
+
+SECTIONS = 3000
+
+
+class EachLineTypeINIConfig(INIConfig):
+    'An INIConfig which tries each line type in turn for every line.'
+    _line_types = list(INIConfig._line_types)
+
+
+class ScanningINIConfig(INIConfig):
+    '''
+    An INIConfig which finds and deletes its sections by going through every
+    line.
+    '''
+
+    def __iter__(self):
+        d = set()
+        d.add(DEFAULTSECT)
+        for x in self._data.contents:
+            if isinstance(x, LineContainer):
+                if x.name not in d:
+                    yield x.name
+                    d.add(x.name)
+
+    def __len__(self):
+        len_ = 0
+        for i in self:
+            len_ += 1
+        return len_
+
+    def __delitem__(self, key):
+        for line in self._sections[key]._lines:
+            self._data.contents.remove(line)
+        del self._sections[key]
+
+
+def deleting_tidy(cfg):
+    'tidy() as it was, deleting extra blank lines one at a time.'
+    def tidy_section(lc):
+        cont = lc.contents
+        i = 1
+        while i < len(cont):
+            if (isinstance(cont[i-1], EmptyLine) and
+                isinstance(cont[i], EmptyLine)):
+                del cont[i]
+            else:
+                i += 1
+        if len(cont) > 1 and isinstance(cont[1], EmptyLine):
+            del cont[1]
+
+    cont = cfg._data.contents
+    i = 1
+    while i < len(cont):
+        if isinstance(cont[i], LineContainer):
+            tidy_section(cont[i])
+            i += 1
+        elif (isinstance(cont[i-1], EmptyLine) and
+              isinstance(cont[i], EmptyLine)):
+            del cont[i]
+        else:
+            i += 1
+    if cont and isinstance(cont[0], EmptyLine):
+        del cont[0]
+    if cont and not isinstance(cont[-1], EmptyLine):
+        cont.append(EmptyLine())
+
+
+def make_update_ini(sections=SECTIONS):
+    'Make the text of a synthetic update.ini with ``sections`` sections.'
+    lines = ['; PortableApps.com Platform update information',
+            '; Generated for benchmarking', '']
+    for i in xrange(sections):
+        lines += [
+                '[Package%iPortable]' % i,
+                'Name=Package %i Portable' % i,
+                'Description=A package for benchmarking.',
+                'Category=%s' % paf.CATEGORIES[i % len(paf.CATEGORIES)],
+                'SubCategory=Other',
+                'URL=http://portableapps.com/apps/package%i' % i,
+                'PackageVersion=1.%i.0.0' % i,
+                'DisplayVersion=1.%i' % i,
+                'DownloadFile=Package%iPortable_1.%i.paf.exe' % (i, i),
+                'Hash=%032x' % i,
+                'DownloadSize=%i' % (i * 7 % 100 + 1),
+                'InstallSize=%i' % (i * 13 % 300 + 1),
+                'ReleaseDate=2026-01-01',
+                ]
+        for language in paf.LANGUAGES[1:1 + i % 4]:
+            lines += ['DownloadFile_%s=Package%iPortable_1.%i_%s.paf.exe' %
+                    (language, i, i, language),
+                    'Hash_%s=%032x' % (language, i)]
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def attributes(obj):
+    'Get the attributes of an object, whether in __slots__ or __dict__.'
+    attrs = dict(getattr(obj, '__dict__', {}))
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, '__slots__', ()):
+            if name not in attrs and hasattr(obj, name):
+                attrs[name] = getattr(obj, name)
+    return attrs
+
+
+def walk(container):
+    'Get the line objects and line containers in a line container.'
+    for item in container.contents:
+        yield item
+        if hasattr(item, 'contents'):
+            for line in walk(item):
+                yield line
+
+
+def lines_of(ini):
+    '''
+    Get the line objects of an INIConfig, for comparison (without the
+    sections they refer back to).
+    '''
+    return [(type(item).__name__, sorted((name, value) for name, value
+            in attributes(item).iteritems() if name != 'section'))
+            for item in walk(ini._data) if not hasattr(item, 'contents')]
+
+
+def structure_size(ini):
+    '''
+    Get the size in bytes of the line objects and line containers of an
+    INIConfig, with the strings and lists they hold (each counted once).
+    '''
+    seen = set()
+    size = sys.getsizeof(ini._data) + sys.getsizeof(ini._data.contents)
+    for item in walk(ini._data):
+        size += sys.getsizeof(item)
+        attrs = attributes(item)
+        if hasattr(item, '__dict__'):
+            size += sys.getsizeof(item.__dict__)
+        for value in attrs.itervalues():
+            if id(value) not in seen and isinstance(value, (basestring, list)):
+                seen.add(id(value))
+                size += sys.getsizeof(value)
+    return size
+
+
+PEAK_MEMORY = r'''
+import sys
+sys.path.insert(0, %r)
+import resource
+from iniparse import INIConfig
+with open(%r) as f:
+    text = f.read()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+with open(%r) as f:
+    ini = INIConfig(f)
+print resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+'''
+
+
+def peak_memory(filename):
+    '''
+    Get how much parsing the file ``filename`` raises the peak memory use of
+    a fresh process, in bytes, or None if that can't be measured here.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    code = PEAK_MEMORY % (os.path.dirname(os.path.dirname(os.path.abspath(
+        __file__))), filename, filename)
+    kilobytes = int(subprocess.check_output([sys.executable, '-c', code]))
+    # ru_maxrss is in bytes on Mac OS X and in kilobytes elsewhere
+    return kilobytes if sys.platform == 'darwin' else kilobytes * 1024
+
+
+def main(filename=None):
+    if filename is None:
+        text = make_update_ini()
+        source = 'a synthetic update.ini'
+        fd, filename = tempfile.mkstemp('.ini')
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+        try:
+            peak = peak_memory(filename)
+        finally:
+            os.remove(filename)
+    else:
+        with open(filename) as f:
+            text = f.read()
+        source = filename
+        peak = peak_memory(filename)
+    text_lines = text.count('\n') + 1
+
+    fast = INIConfig(StringIO(text))
+    slow = EachLineTypeINIConfig(StringIO(text))
+    if str(fast) != str(slow) or lines_of(fast) != lines_of(slow):
+        print 'Results differ!'
+        sys.exit(1)
+
+    def best(func):
+        return min(timeit.repeat(func, number=1, repeat=5))
+
+    lines = StringIO(text).readlines()
+
+    def classify(ini):
+        parse = ini._parse
+        for line in lines:
+            parse(line)
+
+    results = [
+            ('Classifying, trying each line type',
+                best(lambda: classify(slow))),
+            ('Classifying, by first character', best(lambda: classify(fast))),
+            ('Parsing, trying each line type',
+                best(lambda: EachLineTypeINIConfig(StringIO(text)))),
+            ('Parsing, by first character',
+                best(lambda: INIConfig(StringIO(text)))),
+            ]
+
+    for name, seconds in results:
+        print '%-36s %10.2f ms' % (name, seconds * 1000)
+    size = structure_size(fast)
+    print '%-36s %10.2f MB (%i bytes a line)' % ('Size of the parsed file',
+            size / 1048576.0, size // text_lines)
+    if peak is not None:
+        print '%-36s %10.2f MB' % ('Peak memory used parsing it',
+                peak / 1048576.0)
+    print
+    print '(%s: %i sections, %i lines.)' % (source, len(fast), text_lines)
+    print
+
+    section_operations()
+    print
+    tidying()
+    saving(text)
+
+
+def saving(text):
+    'Time saving the INI file with the text ``text`` (see ``main``).'
+    fd, filename = tempfile.mkstemp('.ini')
+    os.close(fd)
+    try:
+        def save(ini):
+            tidy(ini)
+            return atomic_write(filename, unicode(ini), if_changed=True)
+
+        full = None
+        for i in xrange(3):
+            ini = INIConfig(StringIO(text))
+            os.remove(filename)
+            start = timeit.default_timer()
+            save(ini)
+            seconds = timeit.default_timer() - start
+            full = seconds if full is None else min(full, seconds)
+
+        counter = [0]
+
+        def one_key():
+            section = list(ini)[len(ini) // 2]
+            counter[0] += 1
+            ini[section]['DisplayVersion'] = 'Changed %i' % counter[0]
+            if not save(ini):
+                print 'Not written!'
+                sys.exit(1)
+
+        changed = min(timeit.repeat(one_key, number=1, repeat=5))
+        unchanged = min(timeit.repeat(lambda: save(ini), number=1, repeat=5))
+        if save(ini):
+            print 'Written although nothing changed!'
+            sys.exit(1)
+        # Compare with the text built again from every line
+        for item in ini._data.contents:
+            if isinstance(item, LineContainer):
+                item.mark_dirty()
+        with open(filename) as f:
+            if f.read() != unicode(ini):
+                print 'Results differ!'
+                sys.exit(1)
+    finally:
+        os.remove(filename)
+
+    print '%-36s %10.2f ms' % ('Saving, building every section',
+            full * 1000)
+    print '%-36s %10.2f ms' % ('Saving after changing one key',
+            changed * 1000)
+    print '%-36s %10.2f ms' % ('Saving when nothing has changed',
+            unchanged * 1000)
+
+
+def make_untidy_ini(lines=50000, keys=8):
+    '''
+    Make the text of a synthetic INI file of about ``lines`` lines, with
+    ``keys`` keys in each section (as many as it takes with None), most of
+    the lines being blank lines which tidy() will remove.
+    '''
+    text = ['; A synthetic INI file for benchmarking tidy()']
+    i = 0
+    while len(text) < lines:
+        text.append('[Section%i]' % i)
+        text += [''] * 3
+        j = 0
+        while (j < keys if keys is not None else len(text) < lines):
+            text.append('Key%i=Value %i' % (j, j))
+            text += [''] * (j % 4)
+            j += 1
+        text += [''] * 5
+        i += 1
+    return '\n'.join(text)
+
+
+def tidying(lines=50000):
+    '''
+    Time tidy() on synthetic INI files of ``lines`` lines, one with many
+    small sections and one with a single section.
+    '''
+    for keys, description in ((8, 'sections of 8 keys'),
+            (None, 'one section')):
+        text = make_untidy_ini(lines, keys)
+        results = {}
+        for name, func in (('deleting', deleting_tidy), ('rebuilding', tidy)):
+            ini = INIConfig(StringIO(text))
+            start = timeit.default_timer()
+            func(ini)
+            results[name] = timeit.default_timer() - start, str(ini)
+        if results['deleting'][1] != results['rebuilding'][1]:
+            print 'Results differ!'
+            sys.exit(1)
+
+        print '%-36s %10.2f ms' % ('Tidying, deleting each blank line',
+                results['deleting'][0] * 1000)
+        print '%-36s %10.2f ms' % ('Tidying, rebuilding in one pass',
+                results['rebuilding'][0] * 1000)
+        print '(A synthetic INI file of %s: %i lines, %i after tidying.)' % (
+                description, text.count('\n') + 1,
+                results['rebuilding'][1].count('\n') + 1)
+        print
+
+
+def section_operations(sizes=(750, 1500, 3000, 6000, 12000), deletions=20):
+    '''
+    Time counting, listing and deleting sections (``deletions`` of them, from
+    the middle) for synthetic update.ini files of different numbers of
+    sections.
+    '''
+    print '%-8s %19s %19s %19s' % ('Sections', 'len() (us)',
+            'Listing (ms)', 'Deleting (us each)')
+    print '%-8s %9s %9s %9s %9s %9s %9s' % ('', 'scanning', 'index',
+            'scanning', 'index', 'scanning', 'index')
+    for sections in sizes:
+        text = make_update_ini(sections)
+        row = {}
+        for cls in (ScanningINIConfig, INIConfig):
+            ini = cls(StringIO(text))
+            length = min(timeit.repeat(lambda: len(ini), number=10,
+                repeat=3)) / 10
+            listing = min(timeit.repeat(lambda: list(ini), number=10,
+                repeat=3)) / 10
+            names = list(ini)[sections // 2:sections // 2 + deletions]
+            start = timeit.default_timer()
+            for name in names:
+                del ini[name]
+            deleting = (timeit.default_timer() - start) / deletions
+            row[cls] = length, listing, deleting
+        print '%-8i %9.1f %9.1f %9.2f %9.2f %9.1f %9.1f' % (sections,
+                row[ScanningINIConfig][0] * 1e6, row[INIConfig][0] * 1e6,
+                row[ScanningINIConfig][1] * 1e3, row[INIConfig][1] * 1e3,
+                row[ScanningINIConfig][2] * 1e6, row[INIConfig][2] * 1e6)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2:
+        print __doc__.strip()
+        sys.exit(1)
+    main(*sys.argv[1:])
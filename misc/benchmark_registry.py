@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+'''
+Measure the memory used when validating a batch of packages one after the
+other, with the bounded package registry and with an unbounded one (which is
+how Package used to cache every package it was given, forever).
+
+A batch of minimal packages is created in a temporary directory and each
+configuration is run in a fresh process, so that the peak memory figures are
+independent of each other.
+
+Usage: benchmark_registry.py [<number of packages>]
+
+The default number of packages is 5000.
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gc
+import shutil
+import subprocess
+import tempfile
+from os.path import join
+import paf
+from paf.package import PackageRegistry, PACKAGE_REGISTRY_SIZE
+
+
+APPINFO = '''[Format]
+Type=PortableApps.comFormat
+Version=2.0
+
+[Details]
+Name=Package %(i)i Portable
+AppID=Package%(i)iPortable
+Publisher=Nobody
+Homepage=example.com
+Category=Utilities
+Description=A package for benchmarking.
+Language=Multilingual
+
+[License]
+Shareable=true
+OpenSource=true
+Freeware=true
+CommercialUse=true
+
+[Version]
+PackageVersion=1.0.0.0
+DisplayVersion=1.0
+
+[Control]
+Icons=1
+Start=Package%(i)iPortable.exe
+'''
+
+
+def create_packages(directory, count):
+    for i in xrange(count):
+        appinfo = join(directory, 'Package%iPortable' % i, 'App', 'AppInfo')
+        os.makedirs(appinfo)
+        f = open(join(appinfo, 'appinfo.ini'), 'w')
+        f.write(APPINFO % {'i': i})
+        f.close()
+
+
+def peak_memory():
+    '''Get the peak resident set size of this process in KiB, if known.'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak //= 1024  # bytes rather than KiB
+    return peak
+
+
+def run(directory, size):
+    '''
+    Validate all the packages in ``directory`` with a registry of ``size``
+    (0 meaning unbounded) and print the results on one line.
+    '''
+    # Without a bound, never let go of a package, like the old class-level
+    # dict
+    paf.Package.registry = PackageRegistry(size or sys.maxint)
+
+    for name in sorted(os.listdir(directory)):
+        package = paf.Package(join(directory, name))
+        package.errors, package.warnings, package.info
+    del package
+
+    gc.collect()
+    live = sum(1 for o in gc.get_objects() if isinstance(o, paf.Package))
+    print live, len(paf.Package.registry), peak_memory()
+
+
+def main(count):
+    directory = tempfile.mkdtemp()
+    try:
+        create_packages(directory, count)
+        print '%-24s %14s %14s %14s' % ('Registry', 'Live packages',
+                'Registered', 'Peak memory')
+        for label, size in (('unbounded', 0),
+                ('bounded (%i)' % PACKAGE_REGISTRY_SIZE,
+                    PACKAGE_REGISTRY_SIZE)):
+            process = subprocess.Popen([sys.executable, __file__,
+                '--run', directory, str(size)], stdout=subprocess.PIPE)
+            output = process.communicate()[0].split()
+            live, registered, peak = output[-3:]
+            if peak != 'None':
+                peak = '%.1f MiB' % (int(peak) / 1024.)
+            print '%-24s %14s %14s %14s' % (label, live, registered, peak)
+    finally:
+        shutil.rmtree(directory)
+
+    print
+    print '(%i packages validated one after the other.)' % count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--run':
+        # Internal: one configuration, in its own process
+        run(sys.argv[2], int(sys.argv[3]))
+    elif len(sys.argv) > 2 or (len(sys.argv) == 2 and
+            not sys.argv[1].isdigit()):
+        print __doc__.strip()
+        sys.exit(1)
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) == 2 else 5000)
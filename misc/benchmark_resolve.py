@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+'''
+Count the filesystem calls needed to resolve the paths a package is checked
+for, one at a time with path_insensitive (as Package used to) and all at once
+with resolve_many.
+
+Usage: benchmark_resolve.py <package> [<package> ...]
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from os.path import join
+import paf
+import utils
+
+
+calls = {'stat': 0, 'listdir': 0}
+
+
+def counting(name, func):
+    def wrapped(*args, **kwargs):
+        calls[name] += 1
+        return func(*args, **kwargs)
+    return wrapped
+
+
+def measure(func):
+    '''Run ``func`` with a cold listing cache and count the calls it makes.'''
+    utils.path_resolver.invalidate()
+    calls['stat'] = calls['listdir'] = 0
+    real_stat, real_listdir = os.stat, os.listdir
+    # os.path.exists/isdir/isfile all go through os.stat
+    os.stat = counting('stat', real_stat)
+    os.listdir = counting('listdir', real_listdir)
+    try:
+        func()
+    finally:
+        os.stat, os.listdir = real_stat, real_listdir
+    return calls['stat'], calls['listdir']
+
+
+def main(packages):
+    print '%-40s %15s %15s' % ('Package', 'path_insensitive', 'resolve_many')
+    for path in packages:
+        package = paf.Package(os.path.abspath(path), validate=False)
+        paths = package._dirlist(recommended=True) + \
+                package._filelist(recommended=True) + package._suggested_files
+
+        def uncached_path_insensitive(*p):
+            utils.path_resolver.invalidate()
+            return utils.path_insensitive(join(package._directory, *p))
+
+        def one_at_a_time():
+            # The old Package.validate() resolved each path twice, once for
+            # isdir(dirname(...)) and once for isfile(...), with no caching
+            for p in paths:
+                os.path.isdir(os.path.dirname(uncached_path_insensitive(*p)))
+                os.path.isfile(uncached_path_insensitive(*p))
+
+        def all_at_once():
+            paf.PackageSnapshot(package._directory, paths)
+
+        before = measure(one_at_a_time)
+        after = measure(all_at_once)
+        print '%-40s %8i+%-6i %8i+%-6i' % (os.path.basename(path)[:40],
+                before[0], before[1], after[0], after[1])
+
+    print
+    print '(Figures are os.stat calls + os.listdir calls for %i paths.)' % \
+            len(paths)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print __doc__.strip()
+        sys.exit(1)
+    main(sys.argv[1:])
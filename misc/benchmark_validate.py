@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+
+'''
+Time the validation of a large synthetic appinfo.ini, with the compiled
+validation plans INIManager.validate() uses now and with the way it used to
+work it all out from the Meta declarations every time (reproduced here as
+legacy_validate()). The results of the two are checked to be the same.
+
+Usage: benchmark_validate.py [<number of extra keys> [<repetitions>]]
+
+The defaults are 2000 extra keys and 50 repetitions.
+'''
+
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import shutil
+import tempfile
+import timeit
+from os.path import join
+import paf
+from orderedset import OrderedSet
+from languages import LANG
+
+
+APPINFO = '''[Format]
+Type=PortableApps.comFormat
+Version=3.0
+
+[Details]
+Name=Benchmark Portable
+AppID=BenchmarkPortable
+Publisher=Nobody
+Homepage=example.com
+Category=Utilities
+Description=A package for benchmarking.
+Language=Multilingual
+%(details)s
+[License]
+Shareable=true
+OpenSource=true
+Freeware=true
+CommercialUse=true
+
+[Version]
+PackageVersion=1.0.0.0
+DisplayVersion=1.0
+
+[Control]
+Icons=%(icons)i
+Start=BenchmarkPortable.exe
+%(control)s
+%(extra)s'''
+
+
+def create_package(directory, keys):
+    '''
+    Create a package with an appinfo.ini with about ``keys`` keys beyond the
+    usual ones: unknown keys in [Details], lots of icons in [Control] and
+    unknown sections.
+    '''
+    appinfo = join(directory, 'BenchmarkPortable', 'App', 'AppInfo')
+    os.makedirs(appinfo)
+    third = max(keys // 3, 1)
+    icons = third // 2
+    f = open(join(appinfo, 'appinfo.ini'), 'w')
+    f.write(APPINFO % {
+        'details': ''.join('Extra%i=value\n' % i for i in xrange(third)),
+        'icons': icons,
+        'control': ''.join('Start%i=BenchmarkPortable.exe\nName%i=Icon %i\n'
+            % (i, i, i) for i in xrange(1, icons + 1)),
+        'extra': ''.join('[Extra%i]\nKey=value\n\n' % i
+            for i in xrange(third)),
+    })
+    f.close()
+    return join(directory, 'BenchmarkPortable')
+
+
+def legacy_validate(self):
+    '''
+    INIManager.validate() as it was before validation plans (with the
+    declarations from the rule pack, where there are no Meta classes now).
+    '''
+    self.errors = []
+    self.warnings = []
+    self.info = []
+
+    self.load(False)
+    ini = self.ini
+    package = self.package
+    rules = self.validation_plan().rules
+    meta = rules.file if rules is not None else self.Meta(self, ini, package)
+    setini = OrderedSet(ini)
+
+    for missing in meta.mandatory - setini:
+        self.errors.append(LANG.INIVALIDATOR.SECTION_MISSING % dict(filename=self.path(), section=missing))
+
+    for extra in setini - meta.order:
+        self.errors.append(LANG.INIVALIDATOR.SECTION_EXTRA % dict(filename=self.path(), section=extra))
+
+    if meta.enforce_order and setini & meta.order != meta.order & setini:
+        self.warnings.append(LANG.INIVALIDATOR.SECTIONS_OUT_OF_ORDER % dict(filename=self.path()))
+
+    if len(ini) == 0:
+        self.warnings.append(LANG.INIVALIDATOR.FILE_EMPTY % dict(filename=self.path()))
+
+    for section in setini & meta.order:
+        srules = rules.sections.get(section) if rules is not None else None
+        if srules is not None:
+            secval_cls = getattr(self.module, srules.validator or section,
+                    paf.appinfo.SectionValidator)
+        elif hasattr(self.module, section):
+            secval_cls = getattr(self.module, section)
+        else:
+            for mapping in meta.mappings:
+                if mapping.match(section):
+                    secval_cls = getattr(self.module, mapping.target)
+                    break
+        secval = secval_cls(self, ini, package)
+        smeta = srules if srules is not None else \
+                secval.Meta(self, ini, package, secval)
+        inisection = ini[section]
+        inisectionset = OrderedSet(inisection)
+
+        if len(inisection) == 0:
+            self.warnings.append(LANG.INIVALIDATOR.SECTION_EMPTY % dict(filename=self.path(), section=section))
+
+        for key in smeta.mandatory:
+            if key not in inisection:
+                self.errors.append(LANG.INIVALIDATOR.VALUE_MISSING %
+                        dict(filename=self.path(), section=section, key=key))
+            elif inisection[key] == '':
+                self.errors.append(LANG.INIVALIDATOR.VALUE_EMPTY %
+                        dict(filename=self.path(), section=section, key=key))
+
+        for key in inisectionset - smeta.mandatory:
+            if key not in smeta.optional:
+                self.errors.append(LANG.INIVALIDATOR.VALUE_EXTRA %
+                        dict(filename=self.path(), section=section, key=key))
+            elif inisection[key] == '':
+                self.errors.append(LANG.INIVALIDATOR.OMIT_EMPTY %
+                        dict(filename=self.path(), section=section, key=key))
+
+        enforce_order = meta.enforce_order if smeta.enforce_order is Ellipsis else smeta.enforce_order
+        if enforce_order and inisectionset & smeta.order != smeta.order & inisectionset:
+            self.warnings.append(LANG.INIVALIDATOR.KEYS_OUT_OF_ORDER %
+                    dict(filename=self.path(), section=section))
+
+        for key in smeta.order:
+            if key in inisection:
+                if srules is not None and key in srules.keys:
+                    self._add_item(srules.keys[key](secval, inisection[key]))
+                elif hasattr(secval, key):
+                    self._add_item(getattr(secval, key)(inisection[key]))
+                else:
+                    for mapping in smeta.mappings:
+                        if mapping.match(key):
+                            self._add_item(getattr(secval, mapping.target)(inisection[key]))
+                            break
+
+
+def results(manager):
+    return [map(unicode, messages)
+            for messages in (manager.errors, manager.warnings, manager.info)]
+
+
+def main(keys, repetitions):
+    directory = tempfile.mkdtemp()
+    try:
+        package = paf.Package(create_package(directory, keys), validate=False)
+        manager = package.appinfo
+        manager.load()
+
+        legacy_validate(manager)
+        before = results(manager)
+        manager.validate()
+        after = results(manager)
+        if before != after:
+            print 'Validation results differ!'
+            sys.exit(1)
+
+        legacy = min(timeit.repeat(lambda: legacy_validate(manager),
+            number=repetitions, repeat=3)) / repetitions
+        planned = min(timeit.repeat(manager.validate,
+            number=repetitions, repeat=3)) / repetitions
+    finally:
+        shutil.rmtree(directory)
+
+    print '%-24s %10.2f ms' % ('Before (no plan)', legacy * 1000)
+    print '%-24s %10.2f ms' % ('After (compiled plan)', planned * 1000)
+    print
+    print '(Time per validation of an appinfo.ini with %i lines, %i ' \
+            'messages.)' % (len(unicode(manager.ini).splitlines()),
+                    sum(len(m) for m in after))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 3 or not all(arg.isdigit() for arg in sys.argv[1:]):
+        print __doc__.strip()
+        sys.exit(1)
+    main(*([int(arg) for arg in sys.argv[1:]] + [2000, 50][len(sys.argv) - 1:]))
@@ -50,7 +50,7 @@ def check_package(path):
         # Skip files and the "PortableApps.com" directory (Platform etc.)
         return
 
-    package = paf.Package(path)
+    package = paf.Package(path, validate=False)
 
     if not package.launcher_is_pal:
         skipped['not PAL'].append(title)
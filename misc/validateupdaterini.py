@@ -60,7 +60,7 @@ def checker(section, appid, semaphore=None):
     pkg_path = path_insensitive(os.path.join(PACKAGES_ROOT, appid))
     if os.path.isdir(pkg_path):
         try:
-            pkg = paf.Package(pkg_path)
+            pkg = paf.Package(pkg_path, validate=False)
         except paf.PAFException, e:
             print '(Hit PAFException during %s: %s)' % (appid, e)
         else:
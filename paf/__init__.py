@@ -24,8 +24,11 @@ LANGUAGES = ('Multilingual', 'Afrikaans', 'Albanian', 'Arabic', 'Armenian',
 class PAFException(Exception):
     pass
 
+from paf.snapshot import *
+from paf.manifest import *
 from paf.package import *
 from paf.appinfo import *
 from paf.installer import *
 from paf.launcher import *
 from paf.appcompactor import *
+from paf.index import *
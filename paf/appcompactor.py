@@ -5,10 +5,9 @@
 import os
 import sys
 from subprocess import Popen
-from orderedset import OrderedSet
 import config
 from utils import path_windows, get_ini_str
-from validator.engine import INIManager, SectionValidator, FileMeta, SectionMeta, ValidatorError, StringMapping
+from validator.engine import INIManager, SectionValidator, ValidatorError
 
 
 __all__ = ['AppCompactor']
@@ -21,18 +20,11 @@ class AppCompactor(INIManager):
     "The manager for the AppCompactor data (appcompactor.ini)."
 
     module = sys.modules[__name__]
+    rules = 'appcompactor'
 
     def path(self):
         return os.path.join('App', 'AppInfo', 'appcompactor.ini')
 
-    class Meta(FileMeta):
-        mandatory = OrderedSet(('PortableApps.comAppCompactor',))
-        order = OrderedSet(('PortableApps.comAppCompactor',))
-        enforce_order = True  # Ha! ha!
-        mappings = (
-                StringMapping('PortableApps.comAppCompactor', 'Section'),
-                )
-
     def compact(self, block=True):
         """
         Compacts a package with the PortableApps.com AppCompactor. Currently
@@ -121,16 +113,10 @@ class AppCompactor(INIManager):
 
 
 class Section(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('FilesExcluded', 'AdditionalExtensionsExcluded',
-            'AdditionalExtensionsIncluded', 'CompressionFileSizeCutOff'))
-        order = OrderedSet(('FilesExcluded', 'AdditionalExtensionsExcluded',
-            'AdditionalExtensionsIncluded', 'CompressionFileSizeCutOff'))
-
     def CompressionFileSizeCutOff(self, value):
         try:
             value = int(value)
             if value < 0:
                 raise ValueError()
         except ValueError:
-            return ValidatorError("must be a positive integer")
+            return ValidatorError('APPCOMPACTOR.COMPRESSIONFILESIZECUTOFF_BAD')
@@ -10,13 +10,14 @@ from functools import wraps
 import os
 import sys
 from orderedset import OrderedSet
+from utils import path_local
 from paf import FORMAT_VERSION, CATEGORIES, LANGUAGES
-from validator.engine.factory import bool_check
-from validator.engine import (INIManager, SectionValidator, FileMeta, SectionMeta,
-        ValidatorError, ValidatorWarning, ValidatorInfo, RegExMapping)
+from validator.engine import (INIManager, SectionValidator, SectionMeta,
+        ValidatorError, ValidatorWarning, ValidatorInfo, RegExMapping, Edit,
+        fixer)
 
 
-__all__ = ['AppInfo', 'valid_appid']
+__all__ = ['AppInfo', 'valid_appid', 'appid_for_name']
 
 
 def valid_ini(func):
@@ -36,12 +37,7 @@ class AppInfo(INIManager):
     "The manager for the app info (appinfo.ini)."
 
     module = sys.modules[__name__]
-
-    class Meta(FileMeta):
-        mandatory = OrderedSet(('Format', 'Details', 'License', 'Version', 'Control'))
-        optional = OrderedSet(('SpecialPaths', 'Dependencies'))
-        order = OrderedSet(('Format', 'Details', 'License', 'Version', 'SpecialPaths', 'Dependencies', 'Control'))
-        enforce_order = True
+    rules = 'appinfo'
 
     def path(self):
         if self.package.plugin:
@@ -49,6 +45,25 @@ class AppInfo(INIManager):
         else:
             return join('App', 'AppInfo', 'appinfo.ini')
 
+    def inputs(self):
+        # [Control]:Start is looked for in the package root and the EULA in
+        # Other\Source; [Control]:ExtractIcon and [SpecialPaths]:Plugins can
+        # be anywhere, so their directories are needed too.
+        inputs = super(AppInfo, self).inputs() + ['', join('Other', 'Source')]
+        if self.ini is not None:
+            values = []
+            if 'Control' in self.ini:
+                values += [self.ini.Control[key] for key in self.ini.Control
+                        if key.startswith(('Start', 'ExtractIcon'))]
+            if 'SpecialPaths' in self.ini and \
+                    'Plugins' in self.ini.SpecialPaths:
+                values.append(self.ini.SpecialPaths.Plugins)
+            for value in values:
+                directory = os.path.dirname(path_local(value))
+                if directory not in inputs:
+                    inputs.append(directory)
+        return inputs
+
 
 def valid_appid(appid):
     "Check if an AppID is valid and correct it. Returns (valid, appid)."
@@ -91,40 +106,39 @@ def valid_appid(appid):
         return True, appid
 
 
+def appid_for_name(name):
+    """
+    Get the AppID a package with the name ``name`` should have: the name made
+    valid (see ``valid_appid``), with Whatever, Portable Edition becoming
+    WhateverPortable.
+    """
+    if name.endswith(', Portable Edition'):
+        name = name[:-len(', Portable Edition')] + ' Portable'
+    return valid_appid(name)[1]
+
+
 # -------- INI Validation --------
 #
+# The sections and keys, and the simpler checks of values, are declared in
+# the rule pack rules/appinfo.ini; what's here is what needs Python.
 
 class Format(SectionValidator):
-    class Meta(SectionMeta):
-        mandatory = OrderedSet(('Type', 'Version'))
-        order = OrderedSet(('Type', 'Version'))
-
-    def Type(self, value):
-        if value != 'PortableApps.comFormat':
-            return ValidatorError(LANG.APPINFO.BAD_FORMAT_TYPE)
+    # Type: see the rule pack
 
     def Version(self, value):
         if value != FORMAT_VERSION:
             if value < FORMAT_VERSION:
-                return ValidatorWarning(LANG.APPINFO.OLD_FORMAT_VERSION
-                    % dict(old_version=value, current_version=FORMAT_VERSION))
+                return ValidatorWarning('APPINFO.OLD_FORMAT_VERSION',
+                    old_version=value, current_version=FORMAT_VERSION)
             else:
-                return ValidatorError(LANG.APPINFO.BAD_FORMAT_VERSION
-                    % dict(version=FORMAT_VERSION))
+                return ValidatorError('APPINFO.BAD_FORMAT_VERSION',
+                    version=FORMAT_VERSION)
 
 
 class Details(SectionValidator):
-    class Meta(SectionMeta):
-        mandatory = OrderedSet(('Name', 'AppID', 'Publisher', 'Homepage', 'Category', 'Description', 'Language'))
-        optional = OrderedSet(('Donate', 'Trademarks', 'InstallType', 'PluginType'))
-        order = OrderedSet(('Name', 'AppID', 'Publisher', 'Homepage', 'Donate', 'Category', 'Description',
-            'Language', 'Trademarks', 'PluginType', 'InstallType'))
-
     # Name: no validation
 
-    def AppID(self, value):
-        if OrderedSet(value) - '0123456789.-+_ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz':
-            return ValidatorError(LANG.APPINFO.DETAILS_APPID_BAD)
+    # AppID: see the rule pack
 
     # Publisher: no validation
 
@@ -132,28 +146,28 @@ class Details(SectionValidator):
 
     def Homepage(self, value):
         if value.lower().startswith('http://'):
-            return ValidatorInfo(LANG.APPINFO.DETAILS_NO_HTTP % dict(key='Homepage'))
+            return ValidatorInfo('APPINFO.DETAILS_NO_HTTP', key='Homepage')
 
     # Donate: again, no real validation
     # TODO: warn if Donate is missing that it should be there if possible
     def Donate(self, value):
         if value.lower().startswith('http://'):
-            return ValidatorInfo(LANG.APPINFO.DETAILS_NO_HTTP % dict(key='Donate'))
+            return ValidatorInfo('APPINFO.DETAILS_NO_HTTP', key='Donate')
 
     def Category(self, value):
         if value not in CATEGORIES:
-            return ValidatorError(LANG.APPINFO.DETAILS_CATEGORY_BAD)
+            return ValidatorError('APPINFO.DETAILS_CATEGORY_BAD')
 
     def Description(self, value):
         chars = len(value)
         if chars > 512:
-            return ValidatorError(LANG.APPINFO.DETAILS_DESCRIPTION_TOO_LONG)
+            return ValidatorError('APPINFO.DETAILS_DESCRIPTION_TOO_LONG')
         elif chars > 150:
-            return ValidatorWarning(LANG.APPINFO.DETAILS_DESCRIPTION_LONG % dict(chars=chars))
+            return ValidatorWarning('APPINFO.DETAILS_DESCRIPTION_LONG', chars=chars)
 
     def Language(self, value):
         if value not in LANGUAGES:
-            return ValidatorError(LANG.APPINFO.DETAILS_LANGUAGE_BAD)
+            return ValidatorError('APPINFO.DETAILS_LANGUAGE_BAD')
 
     # Trademarks: no validation
 
@@ -162,21 +176,13 @@ class Details(SectionValidator):
     def PluginType(self, value):
         # Only applicable for package.plugin == True
         if not self.package.plugin:
-            return ValidatorError(LANG.APPINFO.DETAILS_PLUGINTYPE_NOT_PLUGIN)
+            return ValidatorError('APPINFO.DETAILS_PLUGINTYPE_NOT_PLUGIN')
         elif value != 'CommonFiles':
-            return ValidatorError(LANG.APPINFO.DETAILS_PLUGINTYPE_BAD)
+            return ValidatorError('APPINFO.DETAILS_PLUGINTYPE_BAD')
 
 
 class License(SectionValidator):
-    class Meta(SectionMeta):
-        mandatory = OrderedSet(('Shareable', 'OpenSource', 'Freeware', 'CommercialUse'))
-        optional = OrderedSet(('EULAVersion',))
-        order = OrderedSet(('Shareable', 'OpenSource', 'Freeware', 'CommercialUse', 'EULAVersion'))
-
-    Shareable = bool_check('License', 'Shareable')
-    OpenSource = bool_check('License', 'OpenSource')
-    Freeware = bool_check('License', 'Freeware')
-    CommercialUse = bool_check('License', 'CommercialUse')
+    # Shareable, OpenSource, Freeware, CommercialUse: see the rule pack
 
     def EULAVersion(self, value):
         if not self.package.eula:
@@ -185,75 +191,57 @@ class License(SectionValidator):
             else:
                 eula = os.path.join('Other', 'Source', 'EULA')
 
-            return ValidatorError(LANG.APPINFO.LICENSE_EULAVERSION_NO_EULA
-            % dict(eula=eula))
+            return ValidatorError('APPINFO.LICENSE_EULAVERSION_NO_EULA',
+                    eula=eula)
 
 
 class Version(SectionValidator):
-    class Meta(SectionMeta):
-        mandatory = OrderedSet(('PackageVersion', 'DisplayVersion'))
-        order = OrderedSet(('PackageVersion', 'DisplayVersion'))
-
     def PackageVersion(self, value):
         try:
             if len(map(int, value.split('.'))) != 4:
                 raise ValueError()
         except ValueError:
-            return ValidatorError(LANG.APPINFO.VERSION_PACKAGEVERSION_BAD)
+            return ValidatorError('APPINFO.VERSION_PACKAGEVERSION_BAD')
 
     # DisplayVersion: no validation yet (TODO)
 
 
 class SpecialPaths(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('Plugins',))
-        order = OrderedSet(('Plugins',))
-
     def Plugins(self, value):
         if value == 'NONE':
-            return ValidatorWarning(LANG.INIVALIDATOR.OMIT_DEFAULT % dict(filename=self.validator.path(),
-                section='SpecialPaths', key='Plugins', default='NONE'))
+            return ValidatorWarning('INIVALIDATOR.OMIT_DEFAULT', filename=self.validator.path(),
+                section='SpecialPaths', key='Plugins', default='NONE')
         elif not os.path.isdir(self.package.path(value)):
-            return ValidatorError(LANG.APPINFO.SPECIALPATHS_PLUGINS_BAD)
+            return ValidatorError('APPINFO.SPECIALPATHS_PLUGINS_BAD')
 
 
 class Dependencies(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('UsesGhostscript', 'UsesJava', 'UsesDotNetVersion'))
-        order = OrderedSet(('UsesGhostscript', 'UsesJava', 'UsesDotNetVersion'))
-
-    def UsesGhostscript(self, value):
-        if value == 'no':
-            return ValidatorWarning(LANG.INIVALIDATOR.OMIT_DEFAULT %
-                    dict(filename=self.validator.path(), section='Dependencies', key='UsesGhostscript',
-                        default='no'))
-        elif value not in ('yes', 'optional'):
-            return ValidatorError(LANG.APPINFO.DEPENDENCIES_USESGHOSTSCRIPT_BAD)
+    # UsesGhostscript: see the rule pack
 
     def UsesJava(self, value):
         if value == 'no':
-            return ValidatorWarning(LANG.INIVALIDATOR.OMIT_DEFAULT %
-                    dict(filename=self.validator.path(), section='Dependencies', key='UsesJava',
-                        default='no'))
+            return ValidatorWarning('INIVALIDATOR.OMIT_DEFAULT',
+                    filename=self.validator.path(), section='Dependencies', key='UsesJava',
+                        default='no')
         elif value in ('true', 'false'):
             if value == 'true':
                 new_value = 'yes'
             elif value == 'false':
                 new_value = 'no'
-            return ValidatorError(LANG.INIVALIDATOR.VALUE_DEPRECATED %
-                    dict(filename=self.validator.path(),section='Dependencies', key='UsesJava',
-                        old_value=value, new_value=new_value))
+            return ValidatorError('INIVALIDATOR.VALUE_DEPRECATED',
+                    filename=self.validator.path(),section='Dependencies', key='UsesJava',
+                        old_value=value, new_value=new_value)
         elif value not in ('yes', 'optional'):
-            return ValidatorError(LANG.APPINFO.DEPENDENCIES_USESJAVA_BAD)
+            return ValidatorError('APPINFO.DEPENDENCIES_USESJAVA_BAD')
 
     def UsesDotNetVersion(self, value):
         if value not in ('1.1', '2.0', '3.0', '3.5', '4.0'):
-            return ValidatorWarning(LANG.APPINFO.DEPENDENCIES_USESDOTNETVERSION_PROBABLY_BAD)
+            return ValidatorWarning('APPINFO.DEPENDENCIES_USESDOTNETVERSION_PROBABLY_BAD')
         else:
             try:
                 map(int, value.split('.'))
             except ValueError:
-                return ValidatorError(LANG.APPINFO.DEPENDENCIES_USESDOTNETVERSION_BAD)
+                return ValidatorError('APPINFO.DEPENDENCIES_USESDOTNETVERSION_BAD')
 
 
 class Control(SectionValidator):
@@ -306,18 +294,18 @@ class Control(SectionValidator):
 
     def Start(self, value):
         if '/' in value or '\\' in value:
-            return ValidatorWarning(LANG.APPINFO.CONTROL_START_NO_SUBDIRS %
-                    dict(section='Control', key='Start'))
+            return ValidatorWarning('APPINFO.CONTROL_START_NO_SUBDIRS',
+                    section='Control', key='Start')
         elif not os.path.isfile(self.package.path(value)):
-            return ValidatorError(LANG.APPINFO.CONTROL_FILE_NOT_EXIST %
-                    dict(section='Control', key='Start'))
+            return ValidatorError('APPINFO.CONTROL_FILE_NOT_EXIST',
+                    section='Control', key='Start')
 
     def ExtractIcon(self, value):
         if not os.path.isfile(self.package.path(value)):
-            return ValidatorError(LANG.APPINFO.CONTROL_FILE_NOT_EXIST %
-                    dict(section='Control', key='ExtractIcon'))
+            return ValidatorError('APPINFO.CONTROL_FILE_NOT_EXIST',
+                    section='Control', key='ExtractIcon')
         else:
-            return ValidatorWarning(LANG.APPINFO.CONTROL_EXTRACTICON_OMIT_UNLESS_REQUIRED)
+            return ValidatorWarning('APPINFO.CONTROL_EXTRACTICON_OMIT_UNLESS_REQUIRED')
 
     def Icons(self, value):
         try:
@@ -325,4 +313,18 @@ class Control(SectionValidator):
             if value < 1:
                 raise ValueError()
         except ValueError:
-            return ValidatorError(LANG.APPINFO.CONTROL_ICONS_BAD)
+            return ValidatorError('APPINFO.CONTROL_ICONS_BAD')
+
+
+# -------- Fixes --------
+#
+
+@fixer('APPINFO.DETAILS_APPID_BAD')
+def _fix_appid(item, ini):
+    appid = valid_appid(ini.Details.AppID)[1]
+    return [Edit('Details', 'AppID', appid)] if appid else []
+
+
+@fixer('APPINFO.DETAILS_NO_HTTP')
+def _fix_no_http(item, ini):
+    return [Edit('Details', item.key, ini.Details[item.key][len('http://'):])]
@@ -0,0 +1,512 @@
+# -*- coding: utf-8 -*-
+
+"""
+An index of the app info of all the packages in a repository (a directory of
+packages), for checks which span packages, such as AppIDs being unique, and
+for answering questions about a repository without opening every package.
+"""
+
+import os
+import re
+import sys
+import sqlite3
+import ConfigParser
+import iniparse
+import config
+import paf
+from utils import path_insensitive, scan_directory, file_signature
+from validator.engine import ValidatorError, ValidatorWarning
+
+
+__all__ = ['PackageIndex', 'repository_checks', 'INDEX_FIELDS']
+
+
+# Bump this if what is indexed changes; older indexes are then rebuilt
+INDEX_FORMAT = 3
+
+# The sections of appinfo.ini which are indexed
+INDEXED_SECTIONS = ('Details', 'Version', 'Control', 'Dependencies')
+
+# Fields which aren't from appinfo.ini, for PackageIndex.query(): the path of
+# the package and its installed size in bytes without the optional component
+# (only if the index was updated with ``sizes`` set)
+INDEX_FIELDS = ('Path', 'InstallSize')
+
+_VERSION = re.compile(r'\d+(?:\.\d+)*\Z')
+
+_OPERATORS = {
+        '=': lambda a, b: a == b,
+        '!=': lambda a, b: a != b,
+        '<': lambda a, b: a < b,
+        '>': lambda a, b: a > b,
+        '<=': lambda a, b: a <= b,
+        '>=': lambda a, b: a >= b,
+        }
+
+
+def _text(value):
+    "Get a (byte) string from a path or an INI file as unicode for SQLite."
+    if isinstance(value, unicode):
+        return value
+    return value.decode(sys.getfilesystemencoding() or 'utf-8', 'replace')
+
+
+def _key(path):
+    return _text(os.path.normcase(os.path.abspath(path)))
+
+
+def _size_signature(path):
+    """
+    Get a signature of the directories of the package ``path`` whose contents
+    make up its installed size, for telling when it has to be worked out
+    again: the package directory, the directories in it (except Data) and
+    the directories in App. Files being added, removed or renamed in them
+    changes it; files changed in place deeper down don't. Returns None if the
+    package can't be listed.
+    """
+    try:
+        signature = [(u'', file_signature(path))]
+        for name, subpath, is_dir, st in scan_directory(path):
+            if not is_dir or name.lower() == 'data':
+                continue
+            signature.append((_text(name), (st.st_mtime, st.st_size)))
+            if name.lower() == 'app':
+                signature.extend((_text(name + '/' + subname),
+                    (sub_st.st_mtime, sub_st.st_size))
+                    for subname, _, sub_is_dir, sub_st
+                    in scan_directory(subpath) if sub_is_dir)
+    except OSError:
+        return None
+    return _text(repr(sorted(signature)))
+
+
+def _sort_key(value):
+    """
+    Get a value from the index in a form for comparing and sorting: numbers
+    and versions (such as 1.2.0.0) by number, anything else as lower case
+    text after them.
+    """
+    if value is None:
+        return (2,)
+    value = unicode(value)
+    if _VERSION.match(value):
+        return 0, tuple(int(part) for part in value.split('.'))
+    return 1, value.lower()
+
+
+def _field_value(values, field):
+    """
+    Get a field (``Section.Key``, ``Key`` from any indexed section or one of
+    ``INDEX_FIELDS``) from a dictionary of a package's indexed values.
+    """
+    if field in values:
+        return values[field]
+    if '.' not in field:
+        for section in INDEXED_SECTIONS:
+            value = values.get(section + '.' + field)
+            if value is not None:
+                return value
+    return None
+
+
+class PackageIndex(object):
+    """
+    The ``[Details]``, ``[Version]``, ``[Control]`` and ``[Dependencies]``
+    sections of the appinfo.ini of each package in one or more repositories,
+    stored in an SQLite database.
+
+    ``update()`` brings the index up to date, only reading the appinfo.ini
+    files which have changed (by modification time and size) since they were
+    last indexed. Looking a package up by path or AppID uses the database's
+    indexes rather than going through every package.
+    """
+
+    def __init__(self, filename=None):
+        if filename is None:
+            filename = config.settings_path('packageindex.sqlite')
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        if self._db.execute('PRAGMA user_version').fetchone()[0] != \
+                INDEX_FORMAT:
+            self._db.execute('DROP TABLE IF EXISTS appinfo')
+            self._db.execute('DROP TABLE IF EXISTS packages')
+            self._db.execute('PRAGMA user_version = %i' % INDEX_FORMAT)
+        self._db.execute('''CREATE TABLE IF NOT EXISTS packages (
+                path TEXT PRIMARY KEY,
+                repository TEXT NOT NULL,
+                directory TEXT NOT NULL,
+                ini_mtime REAL,
+                ini_size INTEGER,
+                install_size INTEGER,
+                size_signature TEXT,
+                appid TEXT,
+                name TEXT,
+                category TEXT)''')
+        self._db.execute('''CREATE INDEX IF NOT EXISTS packages_appid
+                ON packages (repository, appid COLLATE NOCASE)''')
+        self._db.execute('''CREATE INDEX IF NOT EXISTS packages_name
+                ON packages (repository, name)''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS appinfo (
+                path TEXT NOT NULL,
+                section TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                PRIMARY KEY (path, section, key))''')
+        self._db.execute('''CREATE INDEX IF NOT EXISTS appinfo_value
+                ON appinfo (key, value COLLATE NOCASE)''')
+        self._db.commit()
+
+    def update(self, repository, sizes=False, refresh_sizes=False):
+        """
+        Bring the index of the packages in the directory ``repository`` up to
+        date: packages whose appinfo.ini has changed are indexed again, new
+        packages are added and packages which have gone are removed.
+
+        With ``sizes`` set, the installed size of each package which is
+        indexed, hasn't had it worked out yet or whose directories have
+        changed (see ``_size_signature``) is worked out too (see
+        ``Package.installed_size()``). This means going through all the
+        package's files, so it isn't done for packages which look unchanged;
+        ``refresh_sizes`` works out the sizes of all the packages again.
+
+        Returns a tuple of the number of packages (re)indexed and removed.
+        """
+        repository_key = _key(repository)
+        known = {}
+        size_signatures = {}
+        for path, mtime, size, install_size, size_signature in \
+                self._db.execute('''SELECT path, ini_mtime, ini_size,
+                install_size, size_signature FROM packages
+                WHERE repository = ?''', (repository_key,)):
+            known[path] = mtime, size
+            if install_size is not None:
+                size_signatures[path] = size_signature
+
+        indexed = 0
+        seen = set()
+        for name, path, is_dir, st in scan_directory(repository):
+            # Skip files and the "PortableApps.com" directory (Platform etc.)
+            if not is_dir or name == 'PortableApps.com':
+                continue
+            path_key = _key(path)
+            seen.add(path_key)
+
+            ini_path = path_insensitive(os.path.join(path, 'App', 'AppInfo',
+                'appinfo.ini'))
+            if not os.path.isfile(ini_path):
+                # A plugin installer
+                ini_path = path_insensitive(os.path.join(path, 'Other',
+                    'Source', 'plugininstaller.ini'))
+            try:
+                ini_st = os.stat(ini_path)
+                signature = ini_st.st_mtime, ini_st.st_size
+            except OSError:
+                signature = None, None
+
+            if known.get(path_key) != signature:
+                self._index(repository_key, path_key, _text(name), ini_path,
+                        signature)
+                size_signatures.pop(path_key, None)
+                indexed += 1
+
+            if sizes:
+                size_signature = _size_signature(path)
+                if refresh_sizes or size_signature is None or \
+                        size_signatures.get(path_key) != size_signature:
+                    self._index_size(path_key, path, size_signature)
+
+        removed = [path for path in known if path not in seen]
+        for path in removed:
+            self._remove(path)
+
+        self._db.commit()
+        return indexed, len(removed)
+
+    def _index(self, repository_key, path_key, directory, ini_path,
+            signature):
+        "Add or replace the entry for a package."
+        sections = {}
+        if signature[0] is not None:
+            try:
+                with open(ini_path) as f:
+                    ini = iniparse.INIConfig(f)
+            except (IOError, ConfigParser.Error):
+                # Indexed without its details, so it's not read again until
+                # it's changed
+                pass
+            else:
+                for section in INDEXED_SECTIONS:
+                    if section in ini:
+                        sections[section] = dict((_text(key),
+                            _text(ini[section][key]))
+                            for key in ini[section])
+
+        details = sections.get('Details', {})
+        self._remove(path_key)
+        self._db.execute('''INSERT INTO packages (path, repository,
+                directory, ini_mtime, ini_size, appid, name, category)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)''', (path_key,
+                    repository_key, directory) + signature + (
+                    # Compatibility with a former typo in the PAF spec
+                    details.get('AppID', details.get('AppId')),
+                    details.get('Name'), details.get('Category')))
+        self._db.executemany('''INSERT INTO appinfo (path, section, key,
+                value) VALUES (?, ?, ?, ?)''', ((path_key, section, key,
+                    value) for section, values in sections.iteritems()
+                    for key, value in values.iteritems()))
+
+    def _index_size(self, path_key, path, size_signature):
+        """
+        Work out and store the installed size of a package, with the
+        ``_size_signature`` of the package from before it was worked out.
+        """
+        try:
+            size = paf.Package(path, validate=False).installed_size()[0]
+        except (paf.PAFException, EnvironmentError):
+            return
+        self._db.execute('''UPDATE packages SET install_size = ?,
+                size_signature = ? WHERE path = ?''',
+                (size, size_signature, path_key))
+
+    def _remove(self, path_key):
+        self._db.execute('DELETE FROM appinfo WHERE path = ?', (path_key,))
+        self._db.execute('DELETE FROM packages WHERE path = ?', (path_key,))
+
+    def packages(self, repository):
+        "Get the paths of the packages indexed in ``repository``, sorted."
+        return [row[0] for row in self._db.execute('''SELECT path
+                FROM packages WHERE repository = ? ORDER BY path''',
+                (_key(repository),))]
+
+    def get(self, path):
+        """
+        Get the indexed app info of the package ``path`` as a dictionary of
+        {section: {key: value}}, or None if it isn't indexed.
+        """
+        path_key = _key(path)
+        if self._db.execute('SELECT 1 FROM packages WHERE path = ?',
+                (path_key,)).fetchone() is None:
+            return None
+        sections = dict((section, {}) for section in INDEXED_SECTIONS)
+        for section, key, value in self._db.execute('''SELECT section, key,
+                value FROM appinfo WHERE path = ?''', (path_key,)):
+            sections[section][key] = value
+        return sections
+
+    def value(self, path, section, key):
+        "Get one indexed value of the package ``path``, or None."
+        row = self._db.execute('''SELECT value FROM appinfo
+                WHERE path = ? AND section = ? AND key = ?''',
+                (_key(path), section, key)).fetchone()
+        return row[0] if row is not None else None
+
+    def by_appid(self, repository, appid):
+        """
+        Get the paths of the packages in ``repository`` with the AppID
+        ``appid`` (ignoring case), sorted.
+        """
+        return [row[0] for row in self._db.execute('''SELECT path
+                FROM packages WHERE repository = ? AND
+                appid = ? COLLATE NOCASE ORDER BY path''',
+                (_key(repository), _text(appid)))]
+
+    def appid(self, path):
+        "Get the AppID of the package ``path``, or None."
+        row = self._db.execute('SELECT appid FROM packages WHERE path = ?',
+                (_key(path),)).fetchone()
+        return row[0] if row is not None else None
+
+    def appids(self, repository):
+        """
+        Get the paths and AppIDs (None if unknown) of the packages indexed in
+        ``repository``, as a sorted list of (path, AppID) tuples.
+        """
+        return self._db.execute('''SELECT path, appid FROM packages
+                WHERE repository = ? ORDER BY path''',
+                (_key(repository),)).fetchall()
+
+    def names(self, repository):
+        """
+        Get the paths and names (None if unknown) of the packages indexed in
+        ``repository``, as a sorted list of (path, name) tuples.
+        """
+        return self._db.execute('''SELECT path, name FROM packages
+                WHERE repository = ? ORDER BY path''',
+                (_key(repository),)).fetchall()
+
+    def duplicate_appids(self, repository):
+        """
+        Get the AppIDs used by more than one package in ``repository``
+        (ignoring case), as a dictionary of {AppID: sorted list of paths}.
+        """
+        return self._duplicates(repository, 'appid COLLATE NOCASE')
+
+    def duplicate_names(self, repository):
+        """
+        Get the names used by more than one package in ``repository``, as a
+        dictionary of {name: sorted list of paths}.
+        """
+        return self._duplicates(repository, 'name')
+
+    def _duplicates(self, repository, column):
+        duplicates = {}
+        for value, path in self._db.execute('''SELECT %(column)s, path
+                FROM packages WHERE repository = :repository AND
+                %(column)s IN (SELECT %(column)s FROM packages
+                    WHERE repository = :repository AND %(column)s IS NOT NULL
+                    GROUP BY %(column)s HAVING COUNT(*) > 1)
+                ORDER BY path''' % {'column': column},
+                {'repository': _key(repository)}):
+            duplicates.setdefault(value, []).append(path)
+        return duplicates
+
+    def query(self, repository, conditions=(), sort=None, reverse=False,
+            limit=None):
+        """
+        Find the packages in ``repository`` which meet all the
+        ``conditions``, a list of (field, operator, value) tuples. A field is
+        ``Section.Key`` or ``Key`` (in whichever indexed section has it) from
+        appinfo.ini, or one of ``INDEX_FIELDS``; the operators are ``=``,
+        ``!=``, ``<``, ``>``, ``<=`` and ``>=``. Numbers and versions are
+        compared as such, anything else as text ignoring case. A package
+        without the field doesn't meet the condition, except for ``!=``.
+
+        The results are sorted by the field ``sort`` (by path if not given;
+        packages without it last), in reverse with ``reverse`` set, and there
+        are at most ``limit`` of them. Each is a dictionary of all the
+        package's fields, ``Section.Key`` for those from appinfo.ini.
+
+        Conditions with ``=`` on text fields from appinfo.ini are looked up
+        with the database's indexes; the rest are only checked for the
+        packages which meet those.
+        """
+        for field, operator, value in conditions:
+            if operator not in _OPERATORS:
+                raise ValueError('Invalid operator %s' % operator)
+
+        where = ['repository = ?']
+        params = [_key(repository)]
+        for field, operator, value in conditions:
+            # Numbers and versions can be equal without being the same text
+            if operator != '=' or field in INDEX_FIELDS or \
+                    _VERSION.match(value):
+                continue
+            section, _, key = field.rpartition('.')
+            where.append('path IN (SELECT path FROM appinfo WHERE key = ? '
+                    'AND value = ? COLLATE NOCASE%s)' % (' AND section = ?'
+                        if section else ''))
+            params += [key, _text(value)] + ([section] if section else [])
+        where = ' AND '.join(where)
+
+        packages = {}
+        for path, install_size in self._db.execute('''SELECT path,
+                install_size FROM packages WHERE %s''' % where, params):
+            packages[path] = {'Path': path, 'InstallSize': install_size}
+        for path, section, key, value in self._db.execute('''SELECT path,
+                section, key, value FROM appinfo WHERE path IN (SELECT path
+                FROM packages WHERE %s)''' % where, params):
+            packages[path][section + '.' + key] = value
+
+        results = []
+        for values in packages.itervalues():
+            for field, operator, value in conditions:
+                actual = _field_value(values, field)
+                if actual is None:
+                    if operator != '!=':
+                        break
+                elif not _OPERATORS[operator](_sort_key(actual),
+                        _sort_key(value)):
+                    break
+            else:
+                results.append(values)
+
+        results.sort(key=lambda values: values['Path'])
+        if sort is None:
+            if reverse:
+                results.reverse()
+        else:
+            # Packages without the field go last either way
+            missing = [values for values in results
+                    if _field_value(values, sort) is None]
+            results = [values for values in results
+                    if _field_value(values, sort) is not None]
+            results.sort(key=lambda values: _sort_key(_field_value(values,
+                sort)), reverse=reverse)
+            results += missing
+        return results[:limit] if limit is not None else results
+
+    @staticmethod
+    def field(values, field):
+        "Get a field from one of the results of ``query()``, or None."
+        return _field_value(values, field)
+
+    def close(self):
+        self._db.close()
+
+
+def repository_checks(index, repository, update_ini=None):
+    """
+    Check the consistency of the packages in the directory ``repository``,
+    using ``index`` (a ``PackageIndex``, which should be up to date): that
+    AppIDs and names are unique, that each package's AppID is the one its
+    name gives (see ``paf.appid_for_name``), that each package's directory is named after its AppID
+    and, given an ``update_ini`` (the PortableApps.com
+    Updater's update.ini, as an ``INIConfig``), that the categories there
+    match the packages'.
+
+    Returns a tuple (errors, warnings) of lists of results.
+    """
+    errors = []
+    warnings = []
+    filename = os.path.join('App', 'AppInfo', 'appinfo.ini')
+
+    for appid, paths in sorted(index.duplicate_appids(repository).items()):
+        for path in paths:
+            errors.append(ValidatorError('REPOSITORY.DUPLICATE_APPID',
+                package=path, filename=filename, section='Details',
+                key='AppID', appid=appid,
+                others=', '.join(p for p in paths if p != path)))
+
+    for name, paths in sorted(index.duplicate_names(repository).items()):
+        for path in paths:
+            warnings.append(ValidatorWarning('REPOSITORY.DUPLICATE_NAME',
+                package=path, filename=filename, section='Details',
+                key='Name', name=name,
+                others=', '.join(p for p in paths if p != path)))
+
+    names = dict(index.names(repository))
+    for path, appid in index.appids(repository):
+        if appid is None:
+            continue
+        name = names.get(path)
+        # Ignoring case, as AppIDs are compared everywhere else
+        if name is not None and paf.appid_for_name(name.strip()).lower() != \
+                appid.lower():
+            warnings.append(ValidatorWarning(
+                'REPOSITORY.NAME_APPID_MISMATCH', package=path,
+                filename=filename, section='Details', key='AppID',
+                appid=appid, name=name))
+        if os.path.basename(path).lower() != appid.lower():
+            warnings.append(ValidatorWarning(
+                'REPOSITORY.APPID_DIRECTORY_MISMATCH', package=path,
+                filename=filename, section='Details', key='AppID',
+                appid=appid))
+
+    if update_ini is not None:
+        for appid in update_ini:
+            section = update_ini[appid]
+            if 'Category' not in section or section.Category == 'None':
+                continue
+            # For some reason, update.ini uses 'and' instead of '&'
+            category = section.Category.replace(' and ', ' & ')
+            for path in index.by_appid(repository, appid):
+                package_category = index.value(path, 'Details', 'Category')
+                if package_category is not None and \
+                        package_category != category:
+                    warnings.append(ValidatorWarning(
+                        'REPOSITORY.CATEGORY_DRIFT', package=path,
+                        filename=filename, section='Details',
+                        key='Category', category=package_category,
+                        update_category=section.Category))
+
+    return errors, warnings
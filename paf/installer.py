@@ -8,11 +8,9 @@ import sys
 from subprocess import Popen
 import re
 from orderedset import OrderedSet
-from languages import LANG
 import config
 from utils import path_windows, ini_list_from_numbered
-from validator.engine.factory import bool_check
-from validator.engine import (INIManager, SectionValidator, FileMeta, SectionMeta,
+from validator.engine import (INIManager, SectionValidator, SectionMeta,
         ValidatorError, ValidatorWarning)
 
 __all__ = ['Installer']
@@ -22,15 +20,7 @@ class Installer(INIManager):
     "The manager for the app info (installer.ini)."
 
     module = sys.modules[__name__]
-
-    class Meta(FileMeta):
-        optional = OrderedSet(('CheckRunning', 'Source', 'MainDirectories', 'OptionalComponents',
-            'CopyLocalFiles', 'DownloadFiles', 'Languages',
-            'DirectoriesToPreserve', 'DirectoriesToRemove', 'FilesToPreserve', 'FilesToRemove'))
-        order = OrderedSet(('CheckRunning', 'Source', 'MainDirectories', 'OptionalComponents',
-            'CopyLocalFiles', 'DownloadFiles', 'Languages',
-            'DirectoriesToPreserve', 'DirectoriesToRemove', 'FilesToPreserve', 'FilesToRemove'))
-        #enforce_order = True
+    rules = 'installer'
 
     # Kept until validation is finished (TODO)
     """
@@ -178,43 +168,25 @@ class Installer(INIManager):
 
 
 class CheckRunning(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('CloseEXE', 'CloseName'))
-        order = OrderedSet(('CloseEXE', 'CloseName'))
-
     def CloseEXE(self, value):
         if not value.endswith('.exe') and value != 'NONE':
-            return ValidatorWarning(LANG.INSTALLER.CHECKRUNNING_CLOSEEXE_NOT_EXE % dict(filename=self.validator.path()))
+            return ValidatorWarning('INSTALLER.CHECKRUNNING_CLOSEEXE_NOT_EXE', filename=self.validator.path())
 
     def CloseName(self, value):
         if self.package.appinfo.ini and self.package.appinfo.ini.Details.Name == value:
-            return ValidatorWarning(LANG.INSTALLER.CLOSENAME_SAME_AS_APPINFO % dict(filename=self.validator.path()))
+            return ValidatorWarning('INSTALLER.CLOSENAME_SAME_AS_APPINFO', filename=self.validator.path())
 
 
 class Source(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('IncludeInstallerSource',))
-        order = OrderedSet(('IncludeInstallerSource',))
-
     def IncludeInstallerSource(self, value):
         if value not in ('true', 'false'):
-            return ValidatorError(LANG.INIVALIDATOR.BOOL_BAD %
-                    dict(filename=self.validator.path(), section='Source', key='IncludeInstallerSource'))
+            return ValidatorError('INIVALIDATOR.BOOL_BAD',
+                    filename=self.validator.path(), section='Source', key='IncludeInstallerSource')
         elif value == 'false':
-            return ValidatorWarning(LANG.INIVALIDATOR.OMIT_DEFAULT %
-                    dict(filename=self.validator.path(), section='Source', key='IncludeInstallerSource', default='false'))
+            return ValidatorWarning('INIVALIDATOR.OMIT_DEFAULT',
+                    filename=self.validator.path(), section='Source', key='IncludeInstallerSource', default='false')
         else:
-            return ValidatorWarning(LANG.INSTALLER.INCLUDEINSTALLERSOURCE % dict(filename=self.validator.path()))
-
-
-class MainDirectories(SectionValidator):
-    class Meta(SectionMeta):
-        optional = OrderedSet(('RemoveAppDirectory', 'RemoveDataDirectory', 'RemoveOtherDirectory'))
-        order = OrderedSet(('RemoveAppDirectory', 'RemoveDataDirectory', 'RemoveOtherDirectory'))
-
-    RemoveAppDirectory = bool_check('MainDirectories', 'RemoveAppDirectory', 'true')
-    RemoveDataDirectory = bool_check('MainDirectories', 'RemoveDataDirectory', 'false')
-    RemoveOtherDirectory = bool_check('MainDirectories', 'RemoveOther', 'true')
+            return ValidatorWarning('INSTALLER.INCLUDEINSTALLERSOURCE', filename=self.validator.path())
 
 
 class OptionalComponents(SectionValidator):
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+"""
+A record of every file in a package, with its size, modification time and
+hash, for telling what has changed in the package.
+"""
+
+import os
+import json
+import hashlib
+from multiprocessing.pool import ThreadPool
+import config
+from utils import scan_directory, file_hash
+
+__all__ = ['Manifest']
+
+
+# The number of threads used to hash files when building a manifest
+MANIFEST_THREADS = 4
+
+# Bump this if the manifest file format changes
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """
+    The files in a package: ``files`` is a dictionary of {relative path:
+    (size, modification time, MD5 hash)}. Relative paths use forward slashes
+    whatever the platform, so that manifests from different machines can be
+    compared.
+    """
+
+    def __init__(self, root, files=None):
+        self.root = root
+        self.files = files or {}
+
+    @classmethod
+    def build(cls, root, previous=None):
+        """
+        Build the manifest of the directory ``root``. Files which have the
+        same size and modification time as in the manifest ``previous`` keep
+        the hash they had there; the rest are hashed in ``MANIFEST_THREADS``
+        threads.
+        """
+        old_files = previous.files if previous is not None else {}
+        files = {}
+        to_hash = []
+        pending = [(root, '')]
+        while pending:
+            path, prefix = pending.pop()
+            for name, fullpath, is_dir, st in scan_directory(path):
+                relpath = prefix + name
+                if is_dir:
+                    pending.append((fullpath, relpath + '/'))
+                    continue
+                old = old_files.get(relpath)
+                if old is not None and old[:2] == (st.st_size, st.st_mtime):
+                    files[relpath] = old
+                else:
+                    files[relpath] = (st.st_size, st.st_mtime)
+                    to_hash.append((relpath, fullpath))
+
+        if to_hash:
+            pool = ThreadPool(min(MANIFEST_THREADS, len(to_hash)))
+            try:
+                hashes = pool.map(file_hash,
+                        [fullpath for relpath, fullpath in to_hash])
+            finally:
+                pool.close()
+                pool.join()
+            for (relpath, fullpath), md5 in zip(to_hash, hashes):
+                files[relpath] += (md5,)
+
+        return cls(root, files)
+
+    @staticmethod
+    def cache_path(root):
+        """
+        Get the path of the file the manifest of the package directory
+        ``root`` is kept in between runs, in the toolkit's settings directory.
+        """
+        key = os.path.normcase(os.path.abspath(root))
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+        return config.settings_path(os.path.join('manifests',
+            hashlib.md5(key).hexdigest() + '.json'))
+
+    @classmethod
+    def load(cls, filename, root):
+        """
+        Load a manifest saved with ``save()``. Returns None if the file
+        doesn't exist or can't be used.
+        """
+        try:
+            with open(filename, 'rb') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if not isinstance(data, dict) or \
+                data.get('version') != MANIFEST_VERSION:
+            return None
+        return cls(root, dict((relpath, tuple(entry))
+            for relpath, entry in data['files'].iteritems()))
+
+    def save(self, filename):
+        "Save the manifest as JSON."
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(filename, 'wb') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.files}, f,
+                    sort_keys=True)
+
+    def size(self):
+        "Get the total size of the files in bytes."
+        return sum(entry[0] for entry in self.files.itervalues())
+
+    def digest(self):
+        """
+        Get a hash of the names and contents of all the files, for checking
+        whether two builds of a package are the same. Modification times
+        don't come into it.
+        """
+        md5 = hashlib.md5()
+        for relpath in sorted(self.files):
+            name = relpath.encode('utf-8') if isinstance(relpath, unicode) \
+                    else relpath
+            md5.update('%s\0%s\n' % (name, self.files[relpath][2]))
+        return md5.hexdigest()
+
+    def compare(self, other):
+        """
+        Compare this manifest with an older one. Returns sorted lists of the
+        relative paths of the files which have been added, removed and
+        changed (by content) since ``other``.
+        """
+        added = sorted(set(self.files) - set(other.files))
+        removed = sorted(set(other.files) - set(self.files))
+        changed = sorted(relpath for relpath, entry in self.files.iteritems()
+                if relpath in other.files and
+                other.files[relpath][2] != entry[2])
+        return added, removed, changed
@@ -2,17 +2,125 @@
 
 from os.path import exists, isdir, isfile, join, abspath
 import os
+import errno
 import config
-from utils import path_insensitive, path_local, _
+from utils import path_insensitive, path_resolver, scan_directory, _
 from languages import LANG
 from shutil import copy2 as copy
+from multiprocessing.pool import ThreadPool
+from collections import OrderedDict
+from functools import partial
+import threading
+import weakref
 import paf
 from paf import PAFException
+from validator.engine import (ValidatorError, ValidatorWarning, ValidatorInfo,
+        propose_edits)
+from validator.profile import Profiler
 
 
 __all__ = ['Package', 'create_package', 'valid_package']
 
 
+# The number of threads Package.installed_size() uses to scan the package
+INSTALLED_SIZE_THREADS = 8
+
+# The number of recently used packages Package keeps hold of (see
+# PackageRegistry)
+PACKAGE_REGISTRY_SIZE = 32
+
+
+# The number of threads Package.validate() uses, besides the calling thread,
+# to run the parts of validation which don't depend on each other; with 0,
+# they are run one after the other
+VALIDATION_THREADS = 2
+
+# (process ID, ThreadPool) for _run_concurrently(); the process ID is kept
+# as the threads of a pool don't survive into processes forked from this one
+_validation_pool = None
+_validation_pool_lock = threading.Lock()
+
+
+def _run_concurrently(tasks):
+    """
+    Call each of ``tasks``, the first in this thread and the rest on the
+    validation thread pool, and return their results in the same order.
+    """
+    global _validation_pool
+    if VALIDATION_THREADS < 1 or len(tasks) < 2:
+        return [task() for task in tasks]
+
+    with _validation_pool_lock:
+        if _validation_pool is None or _validation_pool[0] != os.getpid():
+            _validation_pool = os.getpid(), ThreadPool(VALIDATION_THREADS)
+        pool = _validation_pool[1]
+
+    pending = [pool.apply_async(task) for task in tasks[1:]]
+    results = [tasks[0]()]
+    results.extend(result.get() for result in pending)
+    return results
+
+
+class PackageRegistry(object):
+    """
+    Keeps track of the Package instances in use, by package directory.
+
+    The ``size`` most recently used packages are held on to; beyond that,
+    packages are only remembered for as long as something else is still
+    using them, so that memory use doesn't grow with the number of packages
+    looked at (e.g. in a batch run).
+    """
+
+    def __init__(self, size=PACKAGE_REGISTRY_SIZE):
+        self.size = size
+        # Most recently used last
+        self._recent = OrderedDict()
+        self._packages = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def key(path):
+        """
+        Get the key for a package directory, so that different ways of
+        writing the same path find the same package.
+        """
+        return os.path.normcase(os.path.normpath(abspath(
+            path_insensitive(path))))
+
+    def get(self, key):
+        "Get the package for a key, or None if there isn't one."
+        package = self._packages.get(key)
+        if package is not None:
+            self._use(key, package)
+        return package
+
+    def add(self, key, package):
+        "Add or replace the package for a key."
+        self._packages[key] = package
+        self._use(key, package)
+
+    def discard(self, key):
+        "Forget about the package for a key, if there is one."
+        self._recent.pop(key, None)
+        self._packages.pop(key, None)
+
+    def clear(self):
+        "Forget about all packages."
+        self._recent.clear()
+        self._packages.clear()
+
+    def _use(self, key, package):
+        self._recent.pop(key, None)
+        self._recent[key] = package
+        while len(self._recent) > self.size:
+            self._recent.popitem(last=False)
+
+    def __len__(self):
+        return len(self._packages)
+
+    def __contains__(self, key):
+        return key in self._packages
+
+
 class Package(object):
     """
     Manages all the details of a package in (or not in!) PortableApps.com
@@ -40,17 +148,34 @@ class Package(object):
             ('Other', 'Help', 'Images'),
     ]
 
-    __instances = {}
+    registry = PackageRegistry()
+
+    # Whether to include a hash of file contents when checking whether files
+    # have changed since the last validation (see validate())
+    hash_inputs = False
+
+    # A validator.profile.Profiler while profiling (see __init__), else None
+    profiler = None
 
-    def __new__(cls, *args, **kwargs):
+    def __new__(cls, package, *args, **kwargs):
         """
-        Cache packages by package directory. Later we may be saving stuff that
-        actually takes a while to load.
+        Cache packages by package directory (see ``PackageRegistry``). A
+        package whose loaded INI files have changed on disk since (see
+        ``is_stale()``) is replaced with a new one, which still reuses the
+        validation results of the parts which haven't changed.
         """
 
-        if args[0] not in cls.__instances:
-            cls.__instances[args[0]] = object.__new__(cls)
-        return cls.__instances[args[0]]
+        key = cls.registry.key(package)
+        instance = cls.registry.get(key)
+        if instance is None or type(instance) is not cls or \
+                instance.is_stale():
+            previous = instance
+            instance = object.__new__(cls)
+            if previous is not None and hasattr(previous, 'snapshot'):
+                instance._validated = dict(previous._validated)
+                instance.snapshot = previous.snapshot
+            cls.registry.add(key, instance)
+        return instance
 
     @property
     def _recommended_files(self):
@@ -107,6 +232,8 @@ class Package(object):
     @property
     def appid(self):
         "Get the AppID of the package."
+        # Only appinfo.ini is needed for this, not a full validation
+        self.appinfo.load(False)
         if self.appinfo.ini is None:
             return None
         if 'AppID' in self.appinfo.ini.Details:
@@ -117,7 +244,17 @@ class Package(object):
         else:
             return None
 
-    def __init__(self, package, launcher_is_pal=None):
+    def __init__(self, package, launcher_is_pal=None, validate=True,
+            profile=False):
+        """
+        Open a package. Unless ``validate`` is False, the package is validated
+        straight away; otherwise that is put off until the results (``errors``,
+        ``warnings`` or ``info``) are first needed, so that just reading the
+        AppID or finding the launcher INI files is quick.
+
+        With ``profile`` set, validation is profiled (see ``profile``) and
+        nothing is reused from earlier validations of the package.
+        """
         Package.current_package = self
         self._directory = package
 
@@ -154,11 +291,99 @@ class Package(object):
             raise PAFException("Invalid value given for launcher_is_pal, " +
                 "must be None, True or False.")
 
-        self.appinfo = paf.AppInfo(self)
-        self.installer = paf.Installer(self)
-        self.launcher = paf.Launcher(self)
+        if profile or not hasattr(self, '_managers'):
+            # The managers are created on first use; see _manager(). Those of
+            # a package which has been opened before are kept, along with the
+            # INI files they have loaded, unless the package is stale.
+            self._managers = {}
+        # The results of validate(), or None if it hasn't been run since
+        self._results = None
 
-        self.validate()
+        if profile:
+            self.profiler = Profiler()
+            self._validated = {}
+        elif 'profiler' in self.__dict__:
+            del self.profiler
+
+        if not hasattr(self, '_validated'):
+            # {part of validation: (signature, (errors, warnings, info))}
+            self._validated = {}
+
+        if validate:
+            self.validate()
+
+    def _manager(self, name, factory):
+        """
+        Get the manager called ``name``, creating it with ``factory`` if it
+        hasn't been used yet.
+        """
+        try:
+            return self._managers[name]
+        except KeyError:
+            manager = self._managers[name] = factory(self)
+            return manager
+
+    @property
+    def appinfo(self):
+        "The ``AppInfo`` manager for App\\AppInfo\\appinfo.ini."
+        return self._manager('appinfo', paf.AppInfo)
+
+    @property
+    def appcompactor(self):
+        "The ``AppCompactor`` manager for App\\AppInfo\\appcompactor.ini."
+        return self._manager('appcompactor', paf.AppCompactor)
+
+    @property
+    def installer(self):
+        "The ``Installer`` for the package."
+        return self._manager('installer', paf.Installer)
+
+    @property
+    def launcher(self):
+        "The ``Launcher`` for the package."
+        return self._manager('launcher', paf.Launcher)
+
+    def _results_of_validation(self):
+        if self._results is None:
+            self.validate()
+        return self._results
+
+    @property
+    def profile(self):
+        """
+        The profile of validation when the package was opened with
+        ``profile=True``, otherwise None: a dictionary of {check or phase
+        name: {'calls': number of calls, 'time': total seconds, 'results':
+        number of results}}. Checks are named like ``AppInfo.Control.Start``
+        and phases like ``Package.files`` and ``AppInfo.load``.
+        """
+        if self.profiler is None:
+            return None
+        return self.profiler.stats()
+
+    def _phase(self, name, func, *args):
+        """Run a phase of validation, profiling it if need be."""
+        if self.profiler is None:
+            return func(*args)
+        return self.profiler.call(name, func, *args)
+
+    @property
+    def errors(self):
+        "The errors from validation, validating the package if need be."
+        return self._results_of_validation()[0]
+
+    @property
+    def warnings(self):
+        "The warnings from validation, validating the package if need be."
+        return self._results_of_validation()[1]
+
+    @property
+    def info(self):
+        """
+        The informational messages from validation, validating the package if
+        need be.
+        """
+        return self._results_of_validation()[2]
 
     def path(self, *path):
         """
@@ -176,17 +401,27 @@ class Package(object):
         return dirlist
 
     def fix_missing_directories(self):
-        "Create required directories that are missing in the package."
+        """
+        Create required directories that are missing in the package. Uses the
+        snapshot from the last validation (or fix) and keeps it up to date.
+        """
         for dirname in self._dirlist(recommended=True):
-            dirpath = self.path(*dirname)
-            if exists(dirpath):
-                if isdir(dirpath):
+            if self.snapshot.exists(*dirname):
+                if self.snapshot.isdir(*dirname):
                     pass  # Directory exists, fine.
                 else:
                     raise PAFException(_('%s should be a directory but a ' +
                         'file with that name already exists') % join(*dirname))
             else:
-                os.mkdir(dirpath)
+                dirpath = self.snapshot.path(*dirname)
+                try:
+                    os.mkdir(dirpath)
+                except OSError as e:
+                    # Created since the snapshot was taken
+                    if e.errno != errno.EEXIST or not isdir(dirpath):
+                        raise
+                path_resolver.invalidate(os.path.dirname(dirpath))
+                self.snapshot.add(dirname, is_dir=True)
 
     def _filelist(self, recommended=False):
         filelist = self._mandatory_files[:]
@@ -199,78 +434,228 @@ class Package(object):
         return filelist
 
     def fix_missing_files(self):
-        "Create required files that are missing in the package."
+        """
+        Create required files that are missing in the package. Uses the
+        snapshot from the last validation (or fix) and keeps it up to date.
+        """
         for filename in self._filelist(recommended=True):
-            filepath = self.path(*filename)
-            if exists(filepath):
-                if isfile(filepath):
+            if self.snapshot.exists(*filename):
+                if self.snapshot.isfile(*filename):
                     pass  # File exists, fine.
                 else:
                     raise PAFException(_('%s should be a file but a ' +
                     'directory with that name already exists') %
                     join(*filename))
             elif isfile(join(config.ROOT_DIR, 'app-template', *filename)):
-                copy(join(config.ROOT_DIR, 'app-template', *filename),
-                        filepath)
-
-    def fix(self):
-        "Fix everything possible in the package."
-        self.fix_missing_directories()
-        self.fix_missing_files()
+                filepath = self.snapshot.path(*filename)
+                # Unless it has been created since the snapshot was taken
+                if not exists(filepath):
+                    copy(join(config.ROOT_DIR, 'app-template', *filename),
+                            filepath)
+                path_resolver.invalidate(os.path.dirname(filepath))
+                self.snapshot.add(filename, is_dir=False)
+
+    def fix(self, dry_run=False):
+        """
+        Fix everything possible in the package: create missing directories
+        and files from the template, and make the edits the fixers propose
+        for the validation results (see ``validator.engine.fixer``), all the
+        edits to each INI file being written at once.
+
+        The package is validated first, as it may have changed on disk since
+        it was opened, but not afterwards: the results are revalidated the
+        next time they're wanted. Either way, only the parts whose files have
+        changed are repeated.
+
+        With ``dry_run`` set, nothing is changed. Returns a list of (path,
+        unified diff) for the INI files which are changed (or would be);
+        files created from the template aren't included.
+        """
         self.validate()
+        results = self._results
+        if not dry_run:
+            self.fix_missing_directories()
+            self.fix_missing_files()
+
+        items = results[0] + results[1] + results[2]
+        diffs = []
+        for manager in (self.appinfo, self.appcompactor):
+            filename = manager.path()
+            edits = propose_edits([item for item in items
+                if item.filename == filename], manager.ini)
+            if edits:
+                diff = manager.apply_edits(edits, dry_run)
+                if diff:
+                    diffs.append((manager.path_abs(), diff))
+
+        if not dry_run:
+            self._results = None
+        return diffs
+
+    def _snapshot_paths(self):
+        return self._dirlist(recommended=True) + \
+                self._filelist(recommended=True) + self._suggested_files
+
+    def take_snapshot(self):
+        """
+        Scan the package directory into ``self.snapshot``, a
+        ``PackageSnapshot`` covering all the files and directories which are
+        checked for during validation.
+        """
+        self.snapshot = paf.PackageSnapshot(self._directory,
+                self._snapshot_paths())
 
     def validate(self):
         """
         Validate or revalidate the package to check PortableApps.com Format™
         compliance.
+
+        The results of each part of the validation are kept along with a
+        signature of the files it depends on, and are reused on revalidation
+        unless those files have changed. With ``hash_inputs`` set, the
+        signatures include a hash of the file contents as well as the
+        modification time and size.
+        """
+
+        # appinfo.ini is loaded first as the file checks need the AppID; after
+        # that, the parts don't depend on each other and are run concurrently
+        appinfo_unchanged = self._load_ini(self.appinfo)
+        results = _run_concurrently([
+            partial(self._phase, 'Package.files', self._validate_files),
+            partial(self._validate_ini, self.appinfo, appinfo_unchanged),
+            partial(self._validate_ini, self.appcompactor),
+            ])
+
+        all_errors, all_warnings, all_info = [], [], []
+        for errors, warnings, info in results:
+            all_errors.extend(errors)
+            all_warnings.extend(warnings)
+            all_info.extend(info)
+        self._results = all_errors, all_warnings, all_info
+
+    def is_stale(self):
+        """
+        Check whether any of the INI files which have been loaded have changed
+        on disk since (see ``INIManager.loaded_signature``). This only takes a
+        few stats, as it is checked every time the package is opened; changes
+        to anything else are found when the package is next validated, which
+        only reuses the results of the parts whose inputs haven't changed.
+        """
+        managers = getattr(self, '_managers', None)
+        if managers is None:
+            # __init__ failed
+            return True
+        for manager in managers.itervalues():
+            loaded = getattr(manager, 'loaded_signature', None)
+            if loaded is not None and loaded != manager.signature():
+                return True
+        return False
+
+    def inputs(self):
+        """
+        Get the absolute paths of all the files and directories which the
+        results of the last validation depend upon. While none of these have
+        changed, validating again will give the same results.
         """
+        inputs = map(os.path.normpath, self.snapshot.directories())
+        for manager in (self.appinfo, self.appcompactor):
+            for path in manager.inputs():
+                path = os.path.normpath(self.path(path))
+                if path not in inputs:
+                    inputs.append(path)
+        return inputs
+
+    def _load_ini(self, manager):
+        """
+        Load the INI file of an INIManager. Returns True if its inputs are
+        unchanged since it was last validated.
+        """
+        name = type(manager).__name__
+        signature = manager.signature(self.hash_inputs)
+        if name in self._validated and self._validated[name][0] == signature:
+            self._phase(name + '.load', manager.load, False)
+            return True
 
-        self.appinfo.load()
-        appcompactor = paf.AppCompactor(self)
-        appcompactor.load()
+        self._phase(name + '.load', manager.load)
+        return False
 
-        self.errors = []
-        self.warnings = []
-        self.info = []
+    def _validate_ini(self, manager, unchanged=None):
+        """
+        Validate an INIManager, unless its inputs are unchanged. If
+        ``_load_ini()`` has already been called, ``unchanged`` is what it
+        returned.
+        """
+        if unchanged is None:
+            unchanged = self._load_ini(manager)
+        name = type(manager).__name__
+        if unchanged:
+            return self._validated[name][1]
+
+        def validate():
+            manager.validate()
+            return manager.errors, manager.warnings, manager.info
+
+        self._phase(name + '.validate', validate)
+        results = manager.errors[:], manager.warnings[:], manager.info[:]
+        # The inputs can depend on what's in the INI file, now it's loaded
+        self._validated[name] = manager.signature(self.hash_inputs), results
+        return results
+
+    def _validate_files(self):
+        """
+        Check for missing files and directories, unless nothing has been
+        added or removed since last time.
+        """
+        paths = self._snapshot_paths()
+        if 'files' in self._validated and \
+                self._validated['files'][0] == (paths,
+                        self.snapshot.signature()):
+            return self._validated['files'][1]
+
+        self._phase('Package.snapshot', self.take_snapshot)
+        snapshot = self.snapshot
+
+        errors = []
+        warnings = []
+        info = []
 
         if not self.launcher_is_pal:
-            self.info.append(LANG.GENERAL.NOT_USING_PAL)
+            info.append(ValidatorInfo('GENERAL.NOT_USING_PAL'))
 
         for directory in self._dirlist():
-            if not isdir(self.path(*directory)):
-                self.errors.append(LANG.GENERAL.DIRECTORY_MISSING %
-                        join(*directory))
+            if not snapshot.isdir(*directory):
+                errors.append(ValidatorError('GENERAL.DIRECTORY_MISSING',
+                    filename=join(*directory)))
 
         for filename in self._filelist():
-            if isdir(os.path.dirname(self.path(*filename))) and \
-            not isfile(self.path(*filename)):
-                self.errors.append(LANG.GENERAL.FILE_MISSING % join(*filename))
+            if snapshot.isdir(*filename[:-1]) and \
+            not snapshot.isfile(*filename):
+                errors.append(ValidatorError('GENERAL.FILE_MISSING',
+                    filename=join(*filename)))
 
         for directory in self._recommended_dirs:
-            if not isdir(self.path(*directory)):
-                self.warnings.append(LANG.GENERAL.DIRECTORY_MISSING %
-                        join(*directory))
+            if not snapshot.isdir(*directory):
+                warnings.append(ValidatorWarning('GENERAL.DIRECTORY_MISSING',
+                    filename=join(*directory)))
 
         recommended_files = self._recommended_files[:]
         if self.launcher_is_pal:
             recommended_files += self._pal_recommended_files
         for filename in recommended_files:
-            if isdir(os.path.dirname(self.path(*filename))) and \
-            not isfile(self.path(*filename)):
-                self.warnings.append(LANG.GENERAL.FILE_MISSING %
-                        join(*filename))
+            if snapshot.isdir(*filename[:-1]) and \
+            not snapshot.isfile(*filename):
+                warnings.append(ValidatorWarning('GENERAL.FILE_MISSING',
+                    filename=join(*filename)))
 
         for filename in self._suggested_files:
-            if isdir(os.path.dirname(self.path(*filename))) and \
-            not isfile(self.path(*filename)):
-                self.info.append(LANG.GENERAL.SUGGESTED_FILE_MISSING %
-                        join(*filename))
+            if snapshot.isdir(*filename[:-1]) and \
+            not snapshot.isfile(*filename):
+                info.append(ValidatorInfo('GENERAL.SUGGESTED_FILE_MISSING',
+                    filename=join(*filename)))
 
-        for o in (self.appinfo, appcompactor):
-            o.validate()
-            self.errors.extend(o.errors)
-            self.warnings.extend(o.warnings)
-            self.info.extend(o.info)
+        results = errors, warnings, info
+        self._validated['files'] = (paths, snapshot.signature()), results
+        return results
 
     @property
     def eula(self):
@@ -296,39 +681,140 @@ class Package(object):
 
         return None
 
+    def manifest(self, save=True):
+        """
+        Get a ``Manifest`` of all the files in the package, with their sizes,
+        modification times and MD5 hashes.
+
+        The last manifest is kept in the toolkit's settings directory (unless
+        ``save`` is False) and only files whose size or modification time has
+        changed since then are hashed again.
+        """
+        filename = paf.Manifest.cache_path(self.path())
+        manifest = paf.Manifest.build(self.path(),
+                paf.Manifest.load(filename, self.path()))
+        if save:
+            manifest.save(filename)
+        return manifest
+
     def installed_size(self):
         """
         Get the installed size of a package based on the current directory
         contents. Returns (size without optional component, size with optional
         component) in bytes. For packages with no optional component, these
         figures will naturally be the same.
+
+        The top levels of the package are scanned first and the directory
+        trees below them are then scanned in parallel, in
+        ``INSTALLED_SIZE_THREADS`` threads.
         """
 
-        size_with_optional = 0
-        size_without_optional = 0
-        optional_dirs = [self.path(path_local(p)) for p in self.installer.optional_component_directories()]
-        optional_files = [self.path(path_local(p)) for p in self.installer.optional_component_files()]
-        data_dir = self.path('Data')
-        for path, dirnames, filenames in os.walk(self.path()):
-            dir_optional = any(path == dir or path.startswith(dir + os.path.sep) for dir in optional_dirs)
-            # Optional components can include stuff in Data, but for the rest
-            # Data is excluded.  So bear that in mind when making calculations.
-            in_data = path == data_dir or path.startswith(data_dir + os.path.sep)
-            for _f in filenames:
-                file_name = os.path.join(path, _f)
-                file_size = os.path.getsize(file_name)
-                if dir_optional or file_name in optional_files:
+        self.installer.load(False)
+
+        # The optional component's directories, as a trie of lower case path
+        # components; a node containing None is an optional directory.
+        optional_dirs = {}
+        for path in self.installer.optional_component_directories():
+            node = optional_dirs
+            for component in _split_lower(path):
+                node = node.setdefault(component, {})
+            node[None] = None
+
+        # The optional component's files, as {lower case directory path
+        # tuple: set of lower case file names}
+        optional_files = {}
+        for path in self.installer.optional_component_files():
+            components = _split_lower(path)
+            if components:
+                optional_files.setdefault(tuple(components[:-1]),
+                        set()).add(components[-1])
+
+        def scan(state):
+            """
+            Scan a directory. Returns the sizes of the files in it (without
+            and with the optional component) and a list of states for its
+            subdirectories.
+            """
+            path, folded, node, optional, in_data = state
+            size_without_optional = size_with_optional = 0
+            subdirectories = []
+            files = optional_files.get(folded, ())
+            try:
+                entries = scan_directory(path)
+            except OSError:
+                # Unreadable, or removed since it was found; os.walk skips
+                # such directories too
+                entries = []
+            for name, fullpath, is_dir, st in entries:
+                name = name.lower()
+                if is_dir:
+                    child = node.get(name) if node else None
+                    subdirectories.append((fullpath, folded + (name,), child,
+                        optional or (child is not None and None in child),
+                        # Optional components can include stuff in Data, but
+                        # for the rest Data is excluded. So bear that in mind
+                        # when making calculations.
+                        in_data or (not folded and name == 'data')))
+                elif optional or name in files:
                     # Component: no increase when not installed, increase
                     # regardless of whether in Data when installed.
-                    size_with_optional += file_size
+                    size_with_optional += st.st_size
                 elif not in_data:
                     # Main portion: always installed, but Data not included
-                    size_without_optional += file_size
-                    size_with_optional += file_size
+                    size_without_optional += st.st_size
+                    size_with_optional += st.st_size
+            return size_without_optional, size_with_optional, subdirectories
+
+        def walk(state):
+            """Scan a whole directory tree."""
+            size_without_optional = size_with_optional = 0
+            pending = [state]
+            while pending:
+                without, with_, subdirectories = scan(pending.pop())
+                size_without_optional += without
+                size_with_optional += with_
+                pending.extend(subdirectories)
+            return size_without_optional, size_with_optional
+
+        size_without_optional = size_with_optional = 0
+
+        # Do the first couple of levels here to split the package up into
+        # enough trees to keep the threads busy.
+        states = [(self.path(), (), optional_dirs, None in optional_dirs,
+            False)]
+        for level in xrange(2):
+            subdirectories = []
+            for state in states:
+                without, with_, children = scan(state)
+                size_without_optional += without
+                size_with_optional += with_
+                subdirectories.extend(children)
+            states = subdirectories
+            if len(states) >= INSTALLED_SIZE_THREADS:
+                break
+
+        if states:
+            pool = ThreadPool(min(len(states), INSTALLED_SIZE_THREADS))
+            try:
+                for without, with_ in pool.map(walk, states):
+                    size_without_optional += without
+                    size_with_optional += with_
+            finally:
+                pool.close()
+                pool.join()
 
         return size_without_optional, size_with_optional
 
 
+def _split_lower(path):
+    """
+    Split a Windows path into a list of lower case components, for
+    case-insensitive matching.
+    """
+    return [component for component in path.lower().replace('/', '\\')
+            .split('\\') if component not in ('', '.')]
+
+
 def create_package(path, create_if_not_exist=False, require_empty=True):
     """
     Create an app package in PortableApps.com Format™.  By default, the
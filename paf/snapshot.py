@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+"""
+A single-pass, case-insensitive view of the parts of a package's directory
+tree which validation is interested in.
+"""
+
+import os
+from os.path import isdir, join
+from utils import path_insensitive, resolve_many, file_signature
+
+__all__ = ['PackageSnapshot']
+
+
+# Returned by PackageSnapshot._lookup for paths the snapshot knows nothing
+# about (as opposed to None for paths it knows do not exist).
+_UNKNOWN = object()
+
+
+class PackageSnapshot(object):
+    """
+    A case-folded, in-memory index of a package's directory structure.
+
+    When the snapshot is taken, all of ``paths`` (a list of package-relative
+    path tuples, as used by ``Package._filelist()`` and friends) are resolved
+    together with ``resolve_many``, so that each directory they share is only
+    listed once. After that, ``isdir``, ``isfile``, ``exists`` and ``path``
+    are answered from memory for those paths. Other paths fall back to the
+    filesystem.
+
+    The snapshot does not watch the disk; code which creates files or
+    directories in the package should tell it with ``add()``.
+    """
+
+    def __init__(self, root, paths=()):
+        self.root = root
+        # Include the parent directories, which are needed anyway, as they are
+        # looked at when checking whether a file should be there
+        prefixes = set()
+        for path in paths:
+            for i in xrange(len(path) + 1):
+                prefixes.add(tuple(path[:i]))
+        paths = sorted(prefixes)
+        # Case-folded path tuple -> (absolute path with real case, is dir) or
+        # None if it doesn't exist
+        self._entries = {}
+        for path, fullpath in zip(paths, resolve_many(root, paths)):
+            if fullpath is None:
+                self._entries[self._fold(path)] = None
+            else:
+                self._entries[self._fold(path)] = (fullpath, isdir(fullpath))
+
+    @staticmethod
+    def _fold(path):
+        return tuple(component.lower() for component in path)
+
+    def _lookup(self, path):
+        """
+        Get the ``(absolute path, is dir)`` entry for a package-relative path,
+        None if the snapshot knows it doesn't exist or ``_UNKNOWN`` if the
+        path is not covered by the snapshot.
+        """
+        return self._entries.get(self._fold(path), _UNKNOWN)
+
+    def add(self, path, is_dir):
+        """
+        Record that a file or directory has been created in the package at the
+        package-relative path tuple ``path``.
+        """
+        self._entries[self._fold(path)] = (self.path(*path), is_dir)
+
+    def path(self, *path):
+        """
+        Get the absolute path to a package-relative path, with the case of
+        each existing component corrected to match what is on disk.
+        """
+        entry = self._lookup(path)
+        if entry is _UNKNOWN:
+            return path_insensitive(join(self.root, *path))
+        elif entry is None:
+            # Doesn't exist, but the parent may well do; resolve it.
+            return join(self.path(*path[:-1]), path[-1])
+        else:
+            return entry[0]
+
+    def directories(self):
+        """
+        Get the absolute paths of the directories the snapshot covers. If
+        files or directories covered by the snapshot are created or removed,
+        one of these will be modified.
+        """
+        return [entry[0] for _, entry in sorted(self._entries.iteritems())
+                if entry is not None and entry[1]]
+
+    def signature(self):
+        """
+        Get a signature of the current state of the directories the snapshot
+        covers (see ``directories()``).
+        """
+        return tuple(file_signature(path) for path in self.directories())
+
+    def exists(self, *path):
+        "Check if a package-relative path exists."
+        entry = self._lookup(path)
+        if entry is _UNKNOWN:
+            return os.path.exists(self.path(*path))
+        return entry is not None
+
+    def isdir(self, *path):
+        "Check if a package-relative path exists and is a directory."
+        entry = self._lookup(path)
+        if entry is _UNKNOWN:
+            return isdir(self.path(*path))
+        return entry is not None and entry[1]
+
+    def isfile(self, *path):
+        "Check if a package-relative path exists and is a file."
+        entry = self._lookup(path)
+        if entry is _UNKNOWN:
+            return os.path.isfile(self.path(*path))
+        return entry is not None and not entry[1]
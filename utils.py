@@ -5,8 +5,21 @@ import os
 import sys
 from subprocess import Popen, PIPE
 import codecs
+import errno
+import hashlib
+import stat
+import threading
+from collections import OrderedDict
 from iniparse import INIConfig
 
+try:
+    from os import scandir  # Python 3.5+
+except ImportError:
+    try:
+        from scandir import scandir  # The backport, if installed
+    except ImportError:
+        scandir = None
+
 _ = lambda x: QApplication.translate("MainWindow", x, None,
         QApplication.UnicodeUTF8)
 
@@ -97,50 +110,342 @@ def path_insensitive(path):
     "/HOME/Chris/I HOPE this doesn't exist"
     """
 
-    return _path_insensitive(path) or path
+    return path_resolver.resolve(path) or path
 
 
-def _path_insensitive(path):
-    """
-    Recursive part of path_insensitive to do the work.
+class CaseInsensitiveResolver(object):
     """
+    Resolves paths case-insensitively for ``path_insensitive``, remembering
+    directory listings so that resolving paths in the same directories again
+    doesn't list them again.
 
-    if path == '' or os.path.exists(path):
-        return path
+    Listings are cached by directory and checked against the directory's
+    modification time each time they are used; at most ``max_directories``
+    listings are kept, the least recently used being discarded first.
+
+    Some filesystems (FAT, for one) only store modification times to the
+    nearest couple of seconds, so code which creates or removes files should
+    call ``invalidate()`` for the directories it has changed.
+
+    It can be used from several threads at once.
+    """
 
-    base = os.path.basename(path)  # may be a directory or a file
-    dirname = os.path.dirname(path)
+    def __init__(self, max_directories=256):
+        self.max_directories = max_directories
+        # normalised directory path -> (mtime, {lower case name: name})
+        self._listings = OrderedDict()
+        # Guards _listings; the filesystem is accessed without it held
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(dirpath):
+        return os.path.normcase(os.path.normpath(dirpath))
+
+    def listing(self, dirpath):
+        """
+        Get the contents of a directory as a dictionary mapping lower case
+        names to real names, or None if it can't be listed.
+        """
+        key = self._key(dirpath)
+        try:
+            mtime = os.stat(dirpath).st_mtime
+        except OSError:
+            with self._lock:
+                self._listings.pop(key, None)
+            return None
 
-    suffix = ''
-    if not base:  # dir ends with a slash?
-        if len(dirname) < len(path):
-            suffix = path[:len(path) - len(dirname)]
+        with self._lock:
+            cached = self._listings.pop(key, None)
+            if cached is not None and cached[0] == mtime:
+                # Reinsert to mark it as the most recently used
+                self._listings[key] = cached
+                return cached[1]
 
-        base = os.path.basename(dirname)
-        dirname = os.path.dirname(dirname)
+        try:
+            names = os.listdir(dirpath)
+        except OSError:  # e.g. it's a file
+            return None
+
+        folded = {}
+        for name in names:
+            folded.setdefault(name.lower(), name)
+
+        with self._lock:
+            self._listings[key] = (mtime, folded)
+            while len(self._listings) > self.max_directories:
+                self._listings.popitem(last=False)
+
+        return folded
+
+    def invalidate(self, dirpath=None):
+        """
+        Forget the cached listing of a directory, or of all directories if no
+        directory is given.
+        """
+        with self._lock:
+            if dirpath is None:
+                self._listings.clear()
+            else:
+                self._listings.pop(self._key(dirpath), None)
+
+    def resolve(self, path):
+        """
+        Get the real path for a path, or None if it doesn't exist. See
+        ``path_insensitive``.
+        """
+
+        if path == '' or os.path.exists(path):
+            return path
+
+        base = os.path.basename(path)  # may be a directory or a file
+        dirname = os.path.dirname(path)
+
+        suffix = ''
+        if not base:  # dir ends with a slash?
+            if len(dirname) < len(path):
+                suffix = path[:len(path) - len(dirname)]
+
+            base = os.path.basename(dirname)
+            dirname = os.path.dirname(dirname)
+
+        if not os.path.exists(dirname):
+            dirname = self.resolve(dirname)
+            if not dirname:
+                return
+
+        # at this point, the directory exists but not the file
+
+        # we are expecting dirname to be a directory, but it could be a file
+        files = self.listing(dirname)
+        if files is None:
+            return
 
-    if not os.path.exists(dirname):
-        dirname = _path_insensitive(dirname)
-        if not dirname:
+        basefinal = files.get(base.lower())
+        if basefinal:
+            return os.path.join(dirname, basefinal) + suffix
+        else:
             return
 
-    # at this point, the directory exists but not the file
 
-    try:  # we are expecting dirname to be a directory, but it could be a file
-        files = os.listdir(dirname)
-    except OSError:
-        return
+    def resolve_many(self, base, paths):
+        """
+        Resolve many paths relative to ``base`` at once. See ``resolve_many``.
+        """
+
+        results = [None] * len(paths)
+        base = self.resolve(base)
+        if base is None:
+            return results
+
+        # Build a trie of the case-folded path components so that each
+        # directory is only looked at once, however many paths go through it.
+        # Each node is a tuple (children, indexes of paths ending here).
+        trie = {}
+        for index, path in enumerate(paths):
+            if not path:
+                results[index] = base
+                continue
+            children = trie
+            for component in path:
+                node = children.get(component.lower())
+                if node is None:
+                    node = children[component.lower()] = ({}, [])
+                children = node[0]
+            node[1].append(index)
+
+        pending = [(base, trie)]
+        while pending:
+            dirpath, children = pending.pop()
+            files = self.listing(dirpath)
+            if files is None:
+                continue  # Doesn't exist or isn't a directory
+
+            for folded, (grandchildren, indexes) in children.iteritems():
+                name = files.get(folded)
+                if name is None:
+                    continue  # Doesn't exist; nor can anything below it
+                fullpath = os.path.join(dirpath, name)
+                for index in indexes:
+                    results[index] = fullpath
+                if grandchildren:
+                    pending.append((fullpath, grandchildren))
+
+        return results
+
+
+path_resolver = CaseInsensitiveResolver()
+
+
+def resolve_many(base, paths):
+    """
+    Get case-insensitive paths for many paths at once. ``paths`` is a list of
+    tuples of path components relative to ``base``.
+
+    This returns a list of the same length as ``paths``, giving for each the
+    real path (like ``path_insensitive``) if it exists or None if it doesn't.
+    Each directory which the paths share is only listed once, so this is much
+    cheaper than calling ``path_insensitive`` for each path.
+
+    >>> resolve_many('/HOME', [('chris', '.GTK-bookmarks'), ('CHRIS',),
+    ...         ('chris', "I HOPE this doesn't exist")])
+    ['/home/chris/.gtk-bookmarks', '/home/chris', None]
+    """
+    return path_resolver.resolve_many(base, paths)
+
+
+def scan_directory(path):
+    """
+    Get the contents of a directory as a list of (name, full path, is
+    directory, ``os.stat`` result) tuples. Symbolic links are followed for
+    files but links to directories are left out, as ``os.walk`` doesn't go
+    into them either.
+
+    If ``scandir`` is available, it is used; on Windows, that gets the stat
+    results along with the directory listing at no extra cost. Entries which
+    are removed while the directory is being scanned are left out; failing to
+    list the directory itself raises OSError.
+    """
+    result = []
+    if scandir is not None:
+        for entry in scandir(path):
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    result.append((entry.name, entry.path, True,
+                        entry.stat()))
+                elif not entry.is_dir():
+                    result.append((entry.name, entry.path, False,
+                        entry.stat()))
+            except OSError:  # Broken symbolic link, or removed since
+                pass
+    else:
+        for name in os.listdir(path):
+            fullpath = os.path.join(path, name)
+            try:
+                st = os.lstat(fullpath)
+            except OSError:  # Removed since
+                continue
+            if stat.S_ISLNK(st.st_mode):
+                try:
+                    st = os.stat(fullpath)
+                except OSError:  # Broken symbolic link
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    continue
+                result.append((name, fullpath, False, st))
+            else:
+                result.append((name, fullpath, stat.S_ISDIR(st.st_mode), st))
+    return result
+
+
+# The size of the blocks files are read in by file_hash()
+HASH_BUFFER_SIZE = 1024 * 1024
 
-    baselow = base.lower()
+
+def file_hash(path):
+    """
+    Get the MD5 hash of a file's contents as a hex string. The file is read
+    in large blocks; hashlib releases the GIL while hashing them, so several
+    files can be hashed at once in threads.
+    """
+    md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(HASH_BUFFER_SIZE)
+            if not data:
+                break
+            md5.update(data)
+    return md5.hexdigest()
+
+
+def file_signature(path, content_hash=False):
+    """
+    Get a signature of the state of a file or directory, for detecting
+    changes: a tuple of its modification time and size and, for a file when
+    ``content_hash`` is set, the MD5 hash of its contents. Returns None if the
+    path doesn't exist.
+    """
     try:
-        basefinal = next(fl for fl in files if fl.lower() == baselow)
-    except StopIteration:
-        return
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    if content_hash and stat.S_ISREG(st.st_mode):
+        return st.st_mtime, st.st_size, file_hash(path)
+
+    return st.st_mtime, st.st_size
+
+
+# MoveFileEx flags, for atomic_write() on Windows
+_MOVEFILE_REPLACE_EXISTING = 0x1
+_MOVEFILE_WRITE_THROUGH = 0x8
 
-    if basefinal:
-        return os.path.join(dirname, basefinal) + suffix
+
+def _replace_file(source, destination):
+    "Rename ``source`` to ``destination``, replacing it if it exists."
+    if win32:
+        # os.rename() won't replace an existing file on Windows
+        import ctypes
+        if not ctypes.windll.kernel32.MoveFileExW(unicode(source),
+                unicode(destination), _MOVEFILE_REPLACE_EXISTING |
+                _MOVEFILE_WRITE_THROUGH):
+            raise ctypes.WinError()
     else:
-        return
+        os.rename(source, destination)
+
+
+def atomic_write(path, data, binary=False, if_changed=False):
+    """
+    Write ``data`` to the file ``path`` so that it's never left half written:
+    the data goes into a temporary file in the same directory, which then
+    replaces ``path`` in one step. The file is opened in text mode unless
+    ``binary`` is set, and keeps its permissions if it already exists.
+
+    With ``if_changed`` set, nothing is written if the file already contains
+    ``data``. Returns True if the file was written.
+    """
+    if if_changed:
+        try:
+            with open(path, 'rb' if binary else 'r') as f:
+                # Encoded as writing it would be
+                if f.read() == (data.encode(sys.getdefaultencoding())
+                        if isinstance(data, unicode) else data):
+                    return False
+        except IOError:
+            pass  # A new file, most likely
+        except UnicodeError:
+            pass  # Can't be what's there; writing it will raise this again
+
+    directory, name = os.path.split(os.path.abspath(path))
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | \
+            (getattr(os, 'O_BINARY', 0) if binary else 0)
+    while True:
+        temp = os.path.join(directory, '.%s.%s.tmp' % (name,
+            os.urandom(4).encode('hex')))
+        try:
+            fd = os.open(temp, flags, 0666)
+            break
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    try:
+        with os.fdopen(fd, 'wb' if binary else 'w') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if not win32:
+            try:
+                os.chmod(temp, stat.S_IMODE(os.stat(path).st_mode))
+            except OSError:
+                pass  # A new file
+        _replace_file(temp, path)
+    except:
+        try:
+            os.remove(temp)
+        except OSError:
+            pass
+        raise
+    return True
 
 
 def path_local(path, absolute=False):
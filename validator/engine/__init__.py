@@ -1,4 +1,5 @@
 import re
+import difflib
 from os import makedirs, remove
 from os.path import dirname, exists, isfile
 from functools import wraps
@@ -6,6 +7,7 @@ import ConfigParser
 import iniparse
 from orderedset import OrderedSet
 from paf import PAFException
+from utils import path_resolver, file_signature, atomic_write
 from languages import LANG
 
 
@@ -94,6 +96,9 @@ class INIManager(object):
     """The manager for the INI files, providing framework and validation."""
 
     module = None
+    # The name of the rule pack (rules/<name>.ini) declaring what the file
+    # should contain, used with or instead of Meta classes; see validator.rules
+    rules = None
 
     def __init__(self, package):
         self.package = package
@@ -101,6 +106,9 @@ class INIManager(object):
         self.warnings = []
         self.info = []
         self.ini = None
+        # The signature of the inputs when the INI file was loaded or last
+        # saved, or None if it hasn't been loaded (see Package.is_stale())
+        self.loaded_signature = None
 
     def path(self):
         return ''
@@ -108,6 +116,22 @@ class INIManager(object):
     def path_abs(self):
         return self.package.path(self.path())
 
+    def inputs(self):
+        """
+        Get the package-relative paths of the files and directories which the
+        validation of this INI file depends upon. To be extended as necessary.
+        """
+        return [self.path()]
+
+    def signature(self, content_hash=False):
+        """
+        Get a signature of the current state of the inputs (see
+        ``utils.file_signature``); while it stays the same, validation will
+        give the same results.
+        """
+        return tuple(file_signature(self.package.path(path), content_hash)
+                for path in self.inputs())
+
     def load(self, do_reload=True):
         """Load the INI file."""
         if not do_reload and self.ini:
@@ -118,6 +142,8 @@ class INIManager(object):
                     if isfile(self.path_abs()) else None)
         except ConfigParser.Error as e:
             self.ini_fail = e
+        # The inputs can depend on what's in the INI file, now it's loaded
+        self.loaded_signature = self.signature()
 
     @assert_valid_ini
     def fix(self):
@@ -145,11 +171,49 @@ class INIManager(object):
         inidir = dirname(self.path_abs())
         if not exists(inidir):
             makedirs(inidir)
+            path_resolver.invalidate(dirname(inidir))
 
-        # Now write it
-        iniw = open(self.path_abs(), 'w')
-        iniw.write(unicode(self.ini))
-        iniw.close()
+        # Now write it, unless that would make no difference (the text of
+        # sections which haven't changed is kept, so this is cheap to check)
+        if atomic_write(self.path_abs(), unicode(self.ini), if_changed=True):
+            path_resolver.invalidate(inidir)
+            self.loaded_signature = self.signature()
+
+    def apply_edits(self, edits, dry_run=False):
+        """
+        Make ``edits`` (a list of ``Edit``) to the INI file as it is on disk,
+        writing it once, atomically (see ``utils.atomic_write``), and tidied
+        as ``save()`` does. Sections the edits leave empty are removed, as
+        ``fix()`` does, and so is the file if no sections are left. With
+        ``dry_run`` set, the file isn't written.
+
+        Returns a unified diff of the change, or an empty string if the edits
+        make no difference.
+        """
+        path = self.path_abs()
+        with open(path) as f:
+            ini = iniparse.INIConfig(f)
+        before = unicode(ini)
+        filled = [section for section in ini if len(ini[section]) > 0]
+        for edit in edits:
+            edit.apply(ini)
+        for section in filled:
+            if section in ini and len(ini[section]) == 0:
+                del ini[section]
+        empty = len(ini) == 0
+        iniparse.tidy(ini)
+        after = u'' if empty else unicode(ini)
+        if after == before:
+            return ''
+
+        if not dry_run:
+            if empty:
+                self.delete()
+            else:
+                atomic_write(path, after)
+            self.ini = ini
+        return ''.join(difflib.unified_diff(before.splitlines(True),
+            after.splitlines(True), path, path))
 
     def delete(self):
         """
@@ -160,15 +224,21 @@ class INIManager(object):
         path = self.path_abs()
         if isfile(path):
             remove(path)
+            path_resolver.invalidate(dirname(path))
 
     def validate(self):
         """
         Validate the appinfo and put the results into ``errors``, ``warnings``
         and ``info`` in ``self``.
         """
+        self.errors = []
+        self.warnings = []
+        self.info = []
+
         self.load(False)
         if self.ini is None:
-            self.errors.append(self.ini_fail)
+            self.errors.append(ValidatorError('INIVALIDATOR.INI_PARSE_ERROR',
+                filename=self.path(), error=unicode(self.ini_fail)))
             return  # Don't need "section missing" errors
 
         if not isfile(self.path_abs()):
@@ -180,82 +250,117 @@ class INIManager(object):
 
         ini = self.ini
         package = self.package
-        meta = self.Meta(self, ini, package)  # () so properties work
+        filename = self.path()
+        plan = self.validation_plan()
+        meta = plan.meta(self, ini, package)
+        # Checked once here rather than for each check; see validator.profile
+        profiler = getattr(package, 'profiler', None)
+        profile_prefix = type(self).__name__ + '.'
         setini = OrderedSet(ini)
 
         for missing in meta.mandatory - setini:
-            self.errors.append(LANG.INIVALIDATOR.SECTION_MISSING % dict(filename=self.path(), section=missing))
+            self.errors.append(ValidatorError('INIVALIDATOR.SECTION_MISSING', filename=filename, section=missing))
 
         for extra in setini - meta.order:
-            self.errors.append(LANG.INIVALIDATOR.SECTION_EXTRA % dict(filename=self.path(), section=extra))
+            self.errors.append(ValidatorError('INIVALIDATOR.SECTION_EXTRA', filename=filename, section=extra))
 
         # Check that they're in the same order
         if meta.enforce_order and setini & meta.order != meta.order & setini:
             # A warning? We like fancy INI files.
-            self.warnings.append(LANG.INIVALIDATOR.SECTIONS_OUT_OF_ORDER % dict(filename=self.path()))
+            self.warnings.append(ValidatorWarning('INIVALIDATOR.SECTIONS_OUT_OF_ORDER', filename=filename))
 
         if len(ini) == 0:
-            self.warnings.append(LANG.INIVALIDATOR.FILE_EMPTY % dict(filename=self.path()))
+            self.warnings.append(ValidatorWarning('INIVALIDATOR.FILE_EMPTY', filename=filename))
 
         for section in setini & meta.order:
-            if hasattr(self.module, section):
-                secval_cls = getattr(self.module, section)
-            else:
-                for mapping in meta.mappings:
-                    if mapping.match(section):
-                        secval_cls = getattr(self.module, mapping.target)
-                        # TODO: could be nice to know what section is in this case...
-                        break
-            secval = secval_cls(self, ini, package)
-            smeta = secval.Meta(self, ini, package, secval)
+            splan = plan.section(section, meta)
+            if splan is None:
+                continue
+            secval = splan.secval_cls(self, ini, package)
+            smeta = splan.meta(self, ini, package, secval)
             inisection = ini[section]
             inisectionset = OrderedSet(inisection)
 
             if len(inisection) == 0:
-                self.warnings.append(LANG.INIVALIDATOR.SECTION_EMPTY % dict(filename=self.path(), section=section))
+                self.warnings.append(ValidatorWarning('INIVALIDATOR.SECTION_EMPTY', filename=filename, section=section))
 
             for key in smeta.mandatory:
                 if key not in inisection:
-                    self.errors.append(LANG.INIVALIDATOR.VALUE_MISSING %
-                            dict(filename=self.path(), section=section, key=key))
+                    self.errors.append(ValidatorError('INIVALIDATOR.VALUE_MISSING',
+                            filename=filename, section=section, key=key))
                 elif inisection[key] == '':
-                    self.errors.append(LANG.INIVALIDATOR.VALUE_EMPTY %
-                            dict(filename=self.path(), section=section, key=key))
+                    self.errors.append(ValidatorError('INIVALIDATOR.VALUE_EMPTY',
+                            filename=filename, section=section, key=key))
 
             for key in inisectionset - smeta.mandatory:
                 if key not in smeta.optional:
-                    self.errors.append(LANG.INIVALIDATOR.VALUE_EXTRA %
-                            dict(filename=self.path(), section=section, key=key))
+                    self.errors.append(ValidatorError('INIVALIDATOR.VALUE_EXTRA',
+                            filename=filename, section=section, key=key))
                 elif inisection[key] == '':
-                    self.errors.append(LANG.INIVALIDATOR.OMIT_EMPTY %
-                            dict(filename=self.path(), section=section, key=key))
+                    self.errors.append(ValidatorError('INIVALIDATOR.OMIT_EMPTY',
+                            filename=filename, section=section, key=key))
 
             # Check that they're in the same order
             enforce_order = meta.enforce_order if smeta.enforce_order is Ellipsis else smeta.enforce_order
             if enforce_order and inisectionset & smeta.order != smeta.order & inisectionset:
                 # A warning? We like fancy INI files.
-                self.warnings.append(LANG.INIVALIDATOR.KEYS_OUT_OF_ORDER %
-                        dict(filename=self.path(), section=section))
+                self.warnings.append(ValidatorWarning('INIVALIDATOR.KEYS_OUT_OF_ORDER',
+                        filename=filename, section=section))
 
             # Oh yeah, we may as well validate the value. Could be handy.
             for key in smeta.order:
                 if key in inisection:
-                    if hasattr(secval, key):
-                        self._add_item(getattr(secval, key)(inisection[key]))
+                    check = splan.check(key, smeta)
+                    if check is None:
+                        continue
+                    if profiler is None:
+                        item = check(secval, inisection[key])
                     else:
-                        for mapping in smeta.mappings:
-                            if mapping.match(key):
-                                self._add_item(getattr(secval, mapping.target)(inisection[key]))
-                                # TODO: could be nice to know what key is in this case...
-                                break
-
-    def _add_item(self, item):
+                        item = profiler.call(profile_prefix +
+                                splan.secval_cls.__name__ + '.' +
+                                check.__name__, check, secval,
+                                inisection[key])
+                    self._add_item(item, section, key)
+
+    @classmethod
+    def validation_plan(cls):
+        """
+        Get the ``ValidationPlan`` for this class, compiling it the first time.
+        """
+        # Not inherited: each manager class has its own plan
+        plan = cls.__dict__.get('_validation_plan')
+        if plan is None:
+            rules = None
+            if cls.rules is not None:
+                # Not imported at the top: validator.rules depends on this
+                from validator.rules import load_rule_pack
+                rules = load_rule_pack(cls.rules)
+            plan = ValidationPlan(cls, rules)
+            cls._validation_plan = plan
+        return plan
+
+    def _add_item(self, item, section=None, key=None):
+        """
+        Add the result of checking a value (an item, a list or tuple of them
+        or None) to the results, filling in the file, section and key it's
+        about if the item doesn't say.
+        """
         if item is None:
             return
         elif isinstance(item, (list, tuple)):
             for i in item:
-                self._add_item(i)
-        elif isinstance(item, ValidatorError):
+                self._add_item(i, section, key)
+            return
+        elif not isinstance(item, ValidatorItem):
+            raise TypeError("INIValidator._add_item wants list, tuple, error, warning or info.")
+
+        item.params.setdefault('filename', self.path())
+        if section is not None:
+            item.params.setdefault('section', section)
+        if key is not None:
+            item.params.setdefault('key', key)
+
+        if isinstance(item, ValidatorError):
             self.errors.append(item)
         elif isinstance(item, ValidatorWarning):
             self.warnings.append(item)
@@ -296,24 +401,332 @@ class SectionMeta(ValidatorObject):
         self.parent = secval
 
 
+class MetaPlan(object):
+    """
+    How to get the ``Meta`` details for validation. If none of ``mandatory``,
+    ``optional``, ``order``, ``enforce_order`` and ``mappings`` is a property
+    (as they are in, for example, appinfo.ini's ``[Control]``), they are the
+    same every time and are read straight off the class, without making a
+    ``Meta`` object.
+    """
+
+    _attributes = ('mandatory', 'optional', 'order', 'enforce_order',
+            'mappings')
+
+    def __init__(self, meta_cls):
+        self.meta_cls = meta_cls
+        self.dynamic = any(isinstance(getattr(meta_cls, name), property)
+                for name in self._attributes)
+
+    def meta(self, *args):
+        "Get the ``Meta`` (or its class, if that will do) for validation."
+        if self.dynamic:
+            return self.meta_cls(*args)
+        return self.meta_cls
+
+
+class SectionPlan(MetaPlan):
+    """
+    The validation plan for a ``SectionValidator`` class: its ``Meta`` (see
+    ``MetaPlan``), or the ``SectionRules`` from a rule pack in its place, and
+    a table of the method (or ``KeyRule``) to check each key with.
+    """
+
+    def __init__(self, secval_cls, rules=None):
+        super(SectionPlan, self).__init__(secval_cls.Meta
+                if rules is None else rules)
+        self.secval_cls = secval_cls
+        self.rules = rules
+        # {key: unbound method or None}
+        self._checks = {}
+        if not self.dynamic:
+            self.mappings = MappingDispatcher(self.meta_cls.mappings)
+
+    def check(self, key, smeta):
+        """
+        Get the (unbound) method to validate the value of ``key`` with, or
+        None if it isn't validated. A rule from the rule pack comes first.
+        """
+        try:
+            return self._checks[key]
+        except KeyError:
+            pass
+
+        if self.rules is not None and key in self.rules.keys:
+            check = self.rules.keys[key]
+        elif hasattr(self.secval_cls, key):
+            check = getattr(self.secval_cls, key)
+        else:
+            mappings = self.mappings if not self.dynamic else \
+                    MappingDispatcher(smeta.mappings)
+            target = mappings.target(key)
+            check = getattr(self.secval_cls, target) if target else None
+
+        if not self.dynamic:
+            self._checks[key] = check
+        return check
+
+
+class ValidationPlan(MetaPlan):
+    """
+    The compiled form of an ``INIManager`` class's ``Meta`` declarations, so
+    that validation doesn't need to work them out again each time: its own
+    ``Meta`` (see ``MetaPlan``) and a table of the ``SectionPlan`` for each
+    section. With a rule pack (``rules``, a ``validator.rules.RulePack``), its
+    declarations are used instead of the ``Meta`` classes it covers.
+    """
+
+    def __init__(self, manager_cls, rules=None):
+        super(ValidationPlan, self).__init__(manager_cls.Meta
+                if rules is None else rules.file)
+        self.module = manager_cls.module
+        self.rules = rules
+        # {section name: SectionPlan or None}
+        self._sections = {}
+        if not self.dynamic:
+            self.mappings = MappingDispatcher(self.meta_cls.mappings)
+        # {(SectionValidator class, SectionRules or None): SectionPlan}
+        self._section_plans = {}
+
+    def section(self, section, meta):
+        """
+        Get the ``SectionPlan`` for the section called ``section``, or None if
+        there is no ``SectionValidator`` for it.
+        """
+        try:
+            return self._sections[section]
+        except KeyError:
+            pass
+
+        secval_cls = None
+        srules = self.rules.sections.get(section) \
+                if self.rules is not None else None
+        if srules is not None:
+            secval_cls = getattr(self.module, srules.validator) \
+                    if srules.validator else \
+                    getattr(self.module, section, SectionValidator)
+        elif hasattr(self.module, section):
+            secval_cls = getattr(self.module, section)
+        else:
+            mappings = self.mappings if not self.dynamic else \
+                    MappingDispatcher(meta.mappings)
+            # TODO: could be nice to know what section is in this case...
+            target = mappings.target(section)
+            if target:
+                secval_cls = getattr(self.module, target)
+
+        splan = None
+        if secval_cls is not None:
+            splan = self._section_plans.get((secval_cls, srules))
+            if splan is None:
+                splan = self._section_plans[secval_cls, srules] = \
+                        SectionPlan(secval_cls, srules)
+
+        if not self.dynamic:
+            self._sections[section] = splan
+        return splan
+
+
+class Severity(object):
+    "The severities of validation results."
+    ERROR = 'error'
+    WARNING = 'warning'
+    INFO = 'info'
+
+
 class ValidatorItem(object):
-    def __init__(self, string):
-        self.string = string
+    """
+    A validation result: a stable ``code``, the name of its message in
+    ``LANG`` as ``SECTION.STRING`` (e.g. ``INIVALIDATOR.VALUE_MISSING``), and
+    the ``params`` to format the message with, which also say which
+    ``filename``, ``section`` and ``key`` it's about where that applies.
+
+    The message is only looked up and formatted when it's turned into a
+    string, so it's in whatever language is current then.
+    """
+
+    __slots__ = ('code', 'params')
+    severity = None
+
+    def __init__(self, code, **params):
+        self.code = code
+        self.params = params
+
+    @property
+    def filename(self):
+        return self.params.get('filename')
+
+    @property
+    def section(self):
+        return self.params.get('section')
+
+    @property
+    def key(self):
+        return self.params.get('key')
+
+    def template(self):
+        "Get the unformatted message in the current language."
+        section, string = self.code.split('.', 1)
+        return getattr(getattr(LANG, section), string)
+
+    def __unicode__(self):
+        if self.params:
+            return self.template() % self.params
+        return self.template()
+
+    __str__ = __unicode__
+
+    def __repr__(self):
+        return '<%s %s %r>' % (type(self).__name__, self.code, self.params)
 
-    def __str__(self):
-        return self.string
+    def __eq__(self, other):
+        return type(self) is type(other) and self.code == other.code and \
+                self.params == other.params
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((type(self), self.code, frozenset(self.params.items())))
+
+    def __getstate__(self):
+        return self.code, self.params
+
+    def __setstate__(self, state):
+        self.code, self.params = state
+
+    def to_dict(self):
+        """
+        Get the details of the result as a dictionary (JSON-serialisable),
+        including the message in the current language.
+        """
+        return {
+                'severity': self.severity,
+                'code': self.code,
+                'filename': self.filename,
+                'section': self.section,
+                'key': self.key,
+                'params': self.params,
+                'message': unicode(self),
+                }
+
+    @staticmethod
+    def from_dict(data):
+        "Make a result from a dictionary from ``to_dict()``."
+        return _item_classes[data['severity']](data['code'],
+                **dict((str(name), value)
+                    for name, value in data['params'].iteritems()))
 
 
 class ValidatorError(ValidatorItem):
-    pass
+    __slots__ = ()
+    severity = Severity.ERROR
 
 
 class ValidatorWarning(ValidatorItem):
-    pass
+    __slots__ = ()
+    severity = Severity.WARNING
 
 
 class ValidatorInfo(ValidatorItem):
-    pass
+    __slots__ = ()
+    severity = Severity.INFO
+
+
+_item_classes = dict((cls.severity, cls)
+        for cls in (ValidatorError, ValidatorWarning, ValidatorInfo))
+
+
+class Edit(object):
+    """
+    A change to an INI file proposed to fix a validation result: set
+    ``[section]:key`` to ``value``, or if ``value`` is None, remove the key,
+    or if ``key`` is None too, remove the whole section.
+    """
+
+    __slots__ = ('section', 'key', 'value')
+
+    def __init__(self, section, key=None, value=None):
+        self.section = section
+        self.key = key
+        self.value = value
+
+    def apply(self, ini):
+        "Make the change to ``ini`` (an ``INIConfig``)."
+        if self.key is None:
+            if self.section in ini:
+                del ini[self.section]
+        elif self.value is None:
+            if self.section in ini and self.key in ini[self.section]:
+                del ini[self.section][self.key]
+        else:
+            ini[self.section][self.key] = self.value
+
+    def _tuple(self):
+        return self.section, self.key, self.value
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self._tuple() == other._tuple()
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self._tuple())
+
+    def __repr__(self):
+        return '<Edit %r>' % (self._tuple(),)
+
+
+# {result code: function(item, ini) returning a list of Edit}
+_fixers = {}
+
+
+def fixer(code):
+    """
+    A decorator registering a function as the fix for validation results
+    with ``code``. It is given the result and the ``INIConfig`` the result is
+    about, and returns a list of the ``Edit`` objects which would fix it (an
+    empty list if it can't be fixed after all).
+    """
+    def register(func):
+        _fixers[code] = func
+        return func
+    return register
+
+
+def propose_edits(items, ini):
+    """
+    Get the edits proposed by the fixers for validation results about the
+    INI file ``ini``, in order and without duplicates.
+    """
+    edits = []
+    seen = set()
+    for item in items:
+        fix = _fixers.get(item.code)
+        if fix is None:
+            continue
+        for edit in fix(item, ini):
+            if edit not in seen:
+                seen.add(edit)
+                edits.append(edit)
+    return edits
+
+
+@fixer('INIVALIDATOR.SECTION_EMPTY')
+def _remove_section(item, ini):
+    return [Edit(item.section)]
+
+
+@fixer('INIVALIDATOR.OMIT_EMPTY')
+@fixer('INIVALIDATOR.OMIT_DEFAULT')
+def _remove_value(item, ini):
+    return [Edit(item.section, item.key)]
+
+
+@fixer('INIVALIDATOR.VALUE_DEPRECATED')
+def _replace_deprecated(item, ini):
+    return [Edit(item.section, item.key, item.params['new_value'])]
 
 
 class Mapping(object):
@@ -324,18 +737,108 @@ class Mapping(object):
     def match(self, value):
         raise NotImplementedError()
 
+    def pattern(self):
+        """
+        Get a regular expression string which matches exactly the same values
+        as ``match()``, for combining with other mappings in a
+        ``MappingDispatcher``, or None if there isn't one.
+        """
+        return None
+
 
 class StringMapping(Mapping):
     def match(self, value):
         return self.matcher == value
 
+    def pattern(self):
+        return re.escape(self.matcher) + r'\Z'
+
 
 class RegExMapping(Mapping):
     def match(self, value):
         return re.match(self.matcher, value)
 
+    def pattern(self):
+        if isinstance(self.matcher, basestring):
+            return self.matcher
+        # A compiled regular expression may have flags; it can't be combined.
+        return None
+
 
 class NumberedMapping(RegExMapping):
+    r"""
+    A mapping for names with hashes representing numbers (see
+    ``regexify_numbered``).
+
+    >>> mapping = NumberedMapping('OptionalFile#', 'OptionalFile')
+    >>> mapping.matcher
+    'OptionalFile[0-9]\\d*'
+    >>> bool(mapping.match('OptionalFile12'))
+    True
+    >>> bool(mapping.match('OptionalDirectory1'))
+    False
+    """
+
     def __init__(self, matcher, target):
-        super(self, NumberedMapping).__init__(matcher, target)
+        super(NumberedMapping, self).__init__(matcher, target)
         self.matcher = regexify_numbered(matcher)
+
+
+class MappingDispatcher(object):
+    r"""
+    Finds the target of the first of a sequence of mappings to match a
+    value. The mappings are combined into one regular expression with a named
+    group for each, so that a single match finds the right one, and the
+    result for each value is remembered.
+
+    >>> dispatcher = MappingDispatcher((
+    ...         StringMapping('Control', 'Section'),
+    ...         NumberedMapping('OptionalFile#', 'OptionalFile'),
+    ...         RegExMapping('Optional', 'Other'),
+    ...         ))
+    >>> dispatcher.target('Control')
+    'Section'
+    >>> dispatcher.target('ControlX') is None
+    True
+    >>> dispatcher.target('OptionalFile3')
+    'OptionalFile'
+    >>> dispatcher.target('OptionalDirectory3')
+    'Other'
+    """
+
+    def __init__(self, mappings):
+        self.mappings = tuple(mappings)
+        # {value: target or None}
+        self._targets = {}
+        self._regex = None
+        patterns = [mapping.pattern() for mapping in self.mappings]
+        if patterns and None not in patterns:
+            try:
+                self._regex = re.compile('|'.join('(?P<m%i>%s)' % (i, pattern)
+                    for i, pattern in enumerate(patterns)))
+            except (re.error, AssertionError):
+                # Something in the patterns doesn't combine well (e.g. group
+                # references), or there are more than Python can handle
+                # (AssertionError); fall back to trying them in turn.
+                pass
+
+    def target(self, value):
+        "Get the target of the first mapping to match ``value``, or None."
+        try:
+            return self._targets[value]
+        except KeyError:
+            pass
+
+        target = None
+        if self._regex is not None:
+            match = self._regex.match(value)
+            if match is not None:
+                target = self.mappings[int(match.lastgroup[1:])].target
+        else:
+            for mapping in self.mappings:
+                if mapping.match(value):
+                    target = mapping.target
+                    break
+
+        self._targets[value] = target
+        return target
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Exporting validation results (``ValidatorItem`` objects) as JSON or as SARIF
+(the Static Analysis Results Interchange Format, version 2.1.0), for other
+tools to consume.
+"""
+
+import os
+import json
+import urllib
+import config
+from languages import LANG
+from validator.engine import Severity
+
+
+__all__ = ['to_json', 'to_sarif']
+
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+_SARIF_LEVELS = {
+        Severity.ERROR: 'error',
+        Severity.WARNING: 'warning',
+        Severity.INFO: 'note',
+        }
+
+
+def _items(results):
+    "Flatten (errors, warnings, info) into one list."
+    errors, warnings, info = results
+    return list(errors) + list(warnings) + list(info)
+
+
+def to_json(packages):
+    """
+    Export the results of validating packages as a JSON string.
+
+    ``packages`` is a list of (package path, results, critical error) tuples,
+    where results is a tuple (errors, warnings, info), or None if validation
+    failed with the critical error message given.
+    """
+    data = []
+    for path, results, critical in packages:
+        data.append({
+            'package': path,
+            'critical': critical,
+            'results': [item.to_dict() for item in _items(results)]
+                if results is not None else [],
+            })
+    return json.dumps({'packages': data}, indent=2, sort_keys=True)
+
+
+def _uri(path):
+    "Turn a file path into a URI for SARIF."
+    path = os.path.abspath(path)
+    if isinstance(path, unicode):
+        path = path.encode('utf-8')
+    return 'file:' + urllib.pathname2url(path)
+
+
+def _location(package, item):
+    location = {'physicalLocation': {'artifactLocation': {'uri': _uri(
+        os.path.join(package, item.filename) if item.filename else package)}}}
+    if item.section is not None:
+        name = item.key if item.key is not None else item.section
+        location['logicalLocations'] = [{
+            'name': name,
+            'fullyQualifiedName': '[%s]' % item.section +
+                (item.key if item.key is not None else ''),
+            'kind': 'member' if item.key is not None else 'namespace',
+            }]
+    return location
+
+
+def to_sarif(packages):
+    """
+    Export the results of validating packages (as for ``to_json``) as a
+    SARIF log, as a JSON string. There is a rule for each result code, with
+    the unformatted message as its description.
+    """
+    rules = {}
+    results = []
+    notifications = []
+    for path, package_results, critical in packages:
+        if package_results is None:
+            notifications.append({
+                'level': 'error',
+                'message': {'text': LANG.VALIDATION.CRITICAL % critical},
+                'locations': [{'physicalLocation': {
+                    'artifactLocation': {'uri': _uri(path)}}}],
+                })
+            continue
+
+        for item in _items(package_results):
+            if item.code not in rules:
+                rules[item.code] = {
+                        'id': item.code,
+                        'shortDescription': {'text': item.template()},
+                        'defaultConfiguration': {
+                            'level': _SARIF_LEVELS[item.severity]},
+                        }
+            results.append({
+                'ruleId': item.code,
+                'level': _SARIF_LEVELS[item.severity],
+                'message': {'text': unicode(item)},
+                'locations': [_location(path, item)],
+                })
+
+    codes = sorted(rules)
+    indexes = dict((code, i) for i, code in enumerate(codes))
+    for result in results:
+        result['ruleIndex'] = indexes[result['ruleId']]
+
+    return json.dumps({
+        '$schema': SARIF_SCHEMA,
+        'version': '2.1.0',
+        'runs': [{
+            'tool': {'driver': {
+                'name': 'PortableApps.com Development Toolkit',
+                'version': unicode(config.padt_version_info),
+                'rules': [rules[code] for code in codes],
+                }},
+            'invocations': [{
+                'executionSuccessful': not notifications,
+                'toolExecutionNotifications': notifications,
+                }],
+            'results': results,
+            }],
+        }, indent=2, sort_keys=True)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in profiling of validation: how long each check and each phase of
+package validation takes, how often it is run and how many results it gives.
+
+Profiling is off unless a ``Profiler`` is given to the package (see
+``Package(path, profile=True)``); code which is profiled checks for a
+profiler once and otherwise runs exactly as it would without profiling.
+"""
+
+import threading
+from timeit import default_timer as timer
+from validator.engine import ValidatorItem
+
+
+__all__ = ['Profiler']
+
+
+def _count_results(result):
+    """
+    Count the validation results in what a check or phase returned: an item,
+    None or (nested) lists or tuples of items.
+    """
+    if result is None:
+        return 0
+    elif isinstance(result, ValidatorItem):
+        return 1
+    elif isinstance(result, (list, tuple)):
+        return sum(_count_results(r) for r in result)
+    else:
+        return 0
+
+
+class Profiler(object):
+    """
+    Collects the number of calls, total wall time and number of results for
+    named checks and phases. Checks and phases may run in different threads.
+    """
+
+    def __init__(self):
+        # {name: [calls, seconds, results]}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds, results=0):
+        "Record a call to ``name`` which took ``seconds``."
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = self._stats[name] = [0, 0.0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += results
+
+    def call(self, name, func, *args):
+        "Call ``func(*args)``, recording it as ``name``, and return the result."
+        start = timer()
+        result = func(*args)
+        self.add(name, timer() - start, _count_results(result))
+        return result
+
+    def stats(self):
+        """
+        Get what has been recorded, as a dictionary of {name: {'calls':
+        number of calls, 'time': total seconds, 'results': number of
+        results}}.
+        """
+        return dict((name, {'calls': calls, 'time': seconds,
+            'results': results})
+            for name, (calls, seconds, results) in self._stats.iteritems())
+
+    def report(self):
+        "Get a table of what has been recorded, slowest first, for printing."
+        lines = ['%-48s %8s %12s %8s' % ('Check', 'Calls', 'Time (ms)',
+            'Results')]
+        for name, (calls, seconds, results) in sorted(
+                self._stats.iteritems(), key=lambda item: -item[1][1]):
+            lines.append('%-48s %8i %12.3f %8i' % (name, calls,
+                seconds * 1000, results))
+        return '\n'.join(lines)
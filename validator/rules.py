@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+
+"""
+Declarative rule packs: the static part of validating an INI file (which
+sections and keys are mandatory and optional, the order they go in, and simple
+constraints on values) kept in a data file in ``rules/`` rather than written
+as ``Meta`` classes and methods. Each rule pack is compiled once into a
+``RulePack`` and pickled in the settings directory, and only compiled again
+when its file changes.
+
+A rule pack looks like this::
+
+    [File]
+    Mandatory=Format|Details
+    Optional=Dependencies
+    Order=Format|Details|Dependencies
+    EnforceOrder=true
+
+    [Section:Details]
+    Mandatory=Name|AppID
+    Order=Name|AppID
+    AppID.Regex=[0-9A-Za-z.+_-]*
+    AppID.Message=APPINFO.DETAILS_APPID_BAD
+
+Lists are separated with ``|``. ``[File]`` and each ``[Section:<name>]`` can
+have ``Mandatory``, ``Optional``, ``Order`` and ``EnforceOrder`` (sections
+inherit ``EnforceOrder`` from the file unless they set it). ``Validator``
+names the ``SectionValidator`` class in the manager's module whose methods
+check any keys the rule pack doesn't (by default, the class with the name of
+the section, if there is one). Constraints on the value of a key are given as
+``<key>.<constraint>``:
+
+``Default``
+    warn (``INIVALIDATOR.OMIT_DEFAULT``) if the value is the default.
+``Bool``
+    if ``true``, the value must be ``true`` or ``false``
+    (``INIVALIDATOR.BOOL_BAD``).
+``Enum``
+    the value must be one of the values listed.
+``Regex``
+    all of the value must match the regular expression.
+
+A value which isn't in ``Enum`` or doesn't match ``Regex`` gives the result
+code ``<key>.Message``, an error unless ``<key>.Severity`` says ``warning`` or
+``info``.
+"""
+
+import os
+import re
+import hashlib
+import cPickle as pickle
+import ConfigParser
+import iniparse
+import config
+from orderedset import OrderedSet
+from paf import PAFException
+from utils import file_signature
+from validator.engine import (ValidatorError, ValidatorWarning, Severity,
+        _item_classes)
+
+
+__all__ = ['RulePack', 'load_rule_pack', 'rule_packs_signature']
+
+
+RULES_DIR = os.path.join(config.ROOT_DIR, 'rules')
+
+# Bump this if the compiled form changes, so that cached packs are recompiled
+RULES_CACHE_VERSION = 1
+
+_KEY_CONSTRAINTS = ('Default', 'Bool', 'Enum', 'Regex', 'Message', 'Severity')
+
+
+def _list(value):
+    "Split a ``|``-separated list from a rule pack into an ``OrderedSet``."
+    return OrderedSet(item.strip() for item in value.split('|') if item.strip())
+
+
+def _bool(value, where):
+    if value not in ('true', 'false'):
+        raise PAFException('%s must be true or false, not "%s"' % (where, value))
+    return value == 'true'
+
+
+class FileRules(object):
+    """
+    The compiled ``[File]`` rules of a rule pack. They have the attributes of
+    a ``FileMeta`` and are used in its place.
+    """
+
+    enforce_order = False
+    mappings = ()
+
+    def __init__(self, mandatory=None, optional=None, order=None,
+            enforce_order=None):
+        self.mandatory = mandatory or OrderedSet()
+        self.optional = optional or OrderedSet()
+        self.order = order or OrderedSet()
+        if enforce_order is not None:
+            self.enforce_order = enforce_order
+
+
+class SectionRules(FileRules):
+    """
+    The compiled rules for a section of a rule pack: the attributes of a
+    ``SectionMeta``, the name of the ``SectionValidator`` class (``validator``,
+    or None for the default) and the ``KeyRule`` for each key (``keys``).
+    """
+
+    enforce_order = Ellipsis  # Inherit from file
+
+    def __init__(self, mandatory=None, optional=None, order=None,
+            enforce_order=None, validator=None, keys=None):
+        super(SectionRules, self).__init__(mandatory, optional, order,
+                enforce_order)
+        self.validator = validator
+        self.keys = keys or {}
+
+
+class KeyRule(object):
+    """
+    The compiled constraints on the value of one key. It is called like a
+    ``SectionValidator`` method, with the section validator and the value.
+    """
+
+    def __init__(self, section, key, default=None, boolean=False, enum=None,
+            regex=None, message=None, severity=Severity.ERROR):
+        self.__name__ = key
+        self.section = section
+        self.key = key
+        self.default = default
+        self.boolean = boolean
+        self.enum = frozenset(enum) if enum is not None else None
+        self.regex = re.compile('(?:%s)\Z' % regex) if regex is not None \
+                else None
+        self.message = message
+        self.severity = severity
+
+    def __call__(self, secval, value):
+        if self.default is not None and value == self.default:
+            return ValidatorWarning('INIVALIDATOR.OMIT_DEFAULT',
+                    filename=secval.validator.path(), section=self.section,
+                    key=self.key, default=self.default)
+        elif self.boolean and value not in ('true', 'false'):
+            return ValidatorError('INIVALIDATOR.BOOL_BAD',
+                    filename=secval.validator.path(), section=self.section,
+                    key=self.key)
+        elif (self.enum is not None and value not in self.enum) or \
+                (self.regex is not None and not self.regex.match(value)):
+            return _item_classes[self.severity](self.message)
+
+
+class RulePack(object):
+    """
+    A compiled rule pack: ``file``, the ``FileRules``, and ``sections``, a
+    dictionary of {section name: ``SectionRules``}.
+    """
+
+    def __init__(self, file_rules, sections):
+        self.file = file_rules
+        self.sections = sections
+
+    @classmethod
+    def compile(cls, filename):
+        """
+        Compile the rule pack in ``filename``. Raises a ``PAFException`` if
+        it isn't valid.
+        """
+        try:
+            with open(filename) as f:
+                ini = iniparse.INIConfig(f)
+        except (IOError, ConfigParser.Error) as e:
+            raise PAFException('Unable to read the rule pack %s: %s' %
+                    (filename, e))
+
+        file_rules = FileRules()
+        sections = {}
+        for name in ini:
+            where = '%s: [%s]' % (os.path.basename(filename), name)
+            if name == 'File':
+                file_rules = FileRules(**cls._meta(ini[name], where, False))
+            elif name.startswith('Section:'):
+                section = name[len('Section:'):]
+                sections[section] = SectionRules(
+                        keys=cls._keys(ini[name], section, where),
+                        **cls._meta(ini[name], where))
+            else:
+                raise PAFException('%s is not a valid rule pack section' %
+                        where)
+
+        return cls(file_rules, sections)
+
+    @staticmethod
+    def _meta(inisection, where, section=True):
+        "Get the ``Meta`` attributes of a section or (not ``section``) ``[File]``."
+        meta = {}
+        for key in ('Mandatory', 'Optional', 'Order'):
+            if key in inisection:
+                meta[key.lower()] = _list(inisection[key])
+        if 'EnforceOrder' in inisection:
+            meta['enforce_order'] = _bool(inisection.EnforceOrder,
+                    where + ' EnforceOrder')
+        if 'Validator' in inisection:
+            if not section:
+                raise PAFException('%s cannot have a Validator' % where)
+            meta['validator'] = inisection.Validator
+        return meta
+
+    @staticmethod
+    def _keys(inisection, section, where):
+        "Get the ``KeyRule`` objects for the keys of a section."
+        constraints = {}
+        for name in inisection:
+            if name in ('Mandatory', 'Optional', 'Order', 'EnforceOrder',
+                    'Validator'):
+                continue
+            key, _, constraint = name.rpartition('.')
+            if not key or constraint not in _KEY_CONSTRAINTS:
+                raise PAFException('%s %s is not a valid rule' %
+                        (where, name))
+            constraints.setdefault(key, {})[constraint] = inisection[name]
+
+        keys = {}
+        for key, c in constraints.iteritems():
+            where_key = '%s %s' % (where, key)
+            if ('Enum' in c or 'Regex' in c) and 'Message' not in c:
+                raise PAFException('%s needs a Message' % where_key)
+            severity = c.get('Severity', Severity.ERROR)
+            if severity not in _item_classes:
+                raise PAFException('%s.Severity "%s" is not valid' %
+                        (where_key, severity))
+            if 'Regex' in c:
+                try:
+                    re.compile(c['Regex'])
+                except re.error as e:
+                    raise PAFException('%s.Regex is not valid: %s' %
+                            (where_key, e))
+            keys[key] = KeyRule(section, key,
+                    default=c.get('Default'),
+                    boolean=_bool(c['Bool'], where_key + '.Bool')
+                        if 'Bool' in c else False,
+                    enum=_list(c['Enum']) if 'Enum' in c else None,
+                    regex=c.get('Regex'),
+                    message=c.get('Message'),
+                    severity=severity)
+        return keys
+
+
+def _cache_path(name):
+    return config.settings_path(os.path.join('rulepacks', name + '.pickle'))
+
+
+def _signature(filename):
+    # What a compiled rule pack depends upon
+    return (RULES_CACHE_VERSION, config.padt_version_info,
+            file_signature(filename, True))
+
+
+def rule_packs_signature():
+    """
+    Get a signature of all the rule packs in ``rules``, as a string, for
+    keying stored validation results on; it changes whenever any of them
+    does.
+    """
+    names = sorted(name for name in os.listdir(RULES_DIR)
+            if name.lower().endswith('.ini'))
+    return hashlib.md5(repr([(name, _signature(os.path.join(RULES_DIR,
+        name))) for name in names])).hexdigest()
+
+
+def load_rule_pack(name):
+    """
+    Get the compiled rule pack ``rules/<name>.ini``: from the cache if it
+    hasn't changed since it was compiled, or compiling it (and caching it)
+    otherwise.
+    """
+    filename = os.path.join(RULES_DIR, name + '.ini')
+    signature = _signature(filename)
+    if signature[-1] is None:
+        raise PAFException('Unable to find the rule pack %s' % filename)
+
+    cache = _cache_path(name)
+    try:
+        with open(cache, 'rb') as f:
+            cached_signature, pack = pickle.load(f)
+        if cached_signature == signature:
+            return pack
+    except Exception:
+        # Missing, out of date or otherwise unusable: compile it again
+        pass
+
+    pack = RulePack.compile(filename)
+    try:
+        directory = os.path.dirname(cache)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        with open(cache, 'wb') as f:
+            pickle.dump((signature, pack), f, pickle.HIGHEST_PROTOCOL)
+    except (IOError, OSError):
+        # Not being able to cache it (e.g. a read-only settings directory)
+        # only costs compiling it next time
+        pass
+    return pack